@@ -1,12 +1,60 @@
 import os
 import sys
+import threading
+import time
 from datetime import datetime
-from typing import Optional
+from typing import Dict, Optional, TextIO, Tuple
 
+# 日志记录: (时间戳, 级别, 名称, 消息, 颜色, 日志文件)
+LogRecord = Tuple[float, str, str, str, Optional[str], Optional[str]]
 
-def _get_timestamp() -> str:
-    """获取时间戳"""
-    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+# 同一进程内所有 logger 共用的输出锁和日志文件句柄，避免多线程输出交错
+_output_lock = threading.Lock()
+_log_files: Dict[str, TextIO] = {}
+# 设置后日志记录发送到该队列，由主进程的 LogAggregator 统一输出
+_log_queue = None
+
+
+def _format_timestamp(timestamp: float) -> str:
+    """格式化时间戳"""
+    return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def set_log_queue(log_queue):
+    """在 worker 进程中调用，之后本进程所有 logger 的输出都发送到 LogAggregator 的队列，传入 None 恢复直接输出"""
+    global _log_queue
+    _log_queue = log_queue
+
+
+def _emit(record: LogRecord):
+    """输出一条日志记录到控制台（带颜色）和日志文件（无颜色）"""
+    timestamp, level, name, message, color, log_file = record
+    log_message = f"[{_format_timestamp(timestamp)}] [{level}] {name}: {message}"
+    with _output_lock:
+        if color:
+            print(f"{FanTwoLogger.COLORS[color]}{log_message}{FanTwoLogger.COLORS['RESET']}")
+        else:
+            print(log_message)
+
+        if log_file:
+            try:
+                f = _log_files.get(log_file)
+                if f is None:
+                    f = _log_files[log_file] = open(log_file, 'a', encoding='utf-8')
+                f.write(log_message + '\n')
+                f.flush()
+            except Exception:
+                pass
+
+
+def _reset_after_fork():
+    """fork 出的子进程可能继承了被其他线程持有的锁，重新创建"""
+    global _output_lock
+    _output_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
 
 
 class FanTwoLogger:
@@ -86,26 +134,15 @@ class FanTwoLogger:
         )
 
     def _write_log(self, level: str, message: str, color: str = None):
-        """写入日志"""
-        timestamp = _get_timestamp()
-        log_message = f"[{timestamp}] [{level}] {self.name}: {message}"
+        """写入日志，设置了日志队列时只发送记录，由主进程统一输出"""
         if not self._should_log(level):
             return
 
-        # 控制台输出（带颜色）
-        if color:
-            colored_message = f"{self.COLORS[color]}{log_message}{self.COLORS['RESET']}"
-            print(colored_message)
+        record = (time.time(), level, self.name, str(message), color, self.log_file)
+        if _log_queue is not None:
+            _log_queue.put(record)
         else:
-            print(log_message)
-
-        # 文件输出（无颜色）
-        if self.log_file:
-            try:
-                with open(self.log_file, 'a', encoding='utf-8') as f:
-                    f.write(log_message + '\n')
-            except Exception:
-                pass
+            _emit(record)
 
     def debug(self, message: str):
         """调试信息"""
@@ -143,6 +180,46 @@ class FanTwoLogger:
         self._write_log('INFO', separator_line, 'BRIGHT_BLUE')
 
 
+class LogAggregator:
+    """多进程日志汇总，worker 进程把日志记录放入队列，由主进程的后台线程统一写控制台和日志文件
+
+    日志文件只有一个写入者，不会出现多个进程的行互相穿插或写入一半的情况；同一进程
+    发出的记录按发送顺序输出。worker 进程中 put 只是放入本地缓冲区，由队列的后台线程
+    负责序列化和发送，不会阻塞日志调用方。
+    """
+
+    def __init__(self, context=None):
+        import multiprocessing
+
+        self.queue = (context or multiprocessing).Queue()
+        self._thread = None
+
+    def _loop(self):
+        while True:
+            try:
+                record = self.queue.get()
+            except Exception as e:
+                # worker 进程在写入过程中被强制结束时可能留下不完整的记录
+                _emit((time.time(), 'ERROR', 'LogAggregator', f"读取日志记录失败: {e}", 'BRIGHT_RED', None))
+                continue
+            if record is None:
+                break
+            _emit(record)
+
+    def start(self):
+        """启动后台输出线程"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """输出队列中剩余的记录后停止后台线程，需在所有 worker 进程退出后调用"""
+        if self._thread is not None:
+            self.queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+
 # Windows 颜色支持
 if os.name == 'nt':  # Windows
     try:
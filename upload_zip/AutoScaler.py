@@ -0,0 +1,199 @@
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from FanTwoLogger import FanTwoLogger
+
+# 主要等待网络的阶段，其余阶段视为 CPU/磁盘密集
+IO_STAGES = ('upload',)
+
+
+class _CpuSampler:
+    """采样系统 CPU 利用率：Linux 读取 /proc/stat，其他平台依次尝试 psutil 和 Windows GetSystemTimes
+
+    都不可用时，allow_process_fallback 为 True（线程模式，工作都在本进程内）退化为本进程 CPU 时间；
+    进程模式下工作在子进程中，子进程运行期间不会计入父进程的 CPU 时间，此时不采样，source 为 None。
+    """
+
+    def __init__(self, allow_process_fallback: bool = True):
+        self._cpu_count = os.cpu_count() or 1
+        readers = [('/proc/stat', self._read_proc_stat), ('psutil', self._read_psutil),
+                   ('GetSystemTimes', self._read_windows)]
+        if allow_process_fallback:
+            readers.append(('本进程 CPU 时间', self._read_process))
+
+        self.source: Optional[str] = None
+        self._reader: Optional[Callable[[], Tuple[float, float]]] = None
+        self._last: Optional[Tuple[float, float]] = None
+        for source, reader in readers:
+            try:
+                self._last = reader()
+            except (OSError, ImportError, AttributeError, ValueError, IndexError):
+                continue
+            self.source, self._reader = source, reader
+            break
+
+    @staticmethod
+    def _read_proc_stat() -> Tuple[float, float]:
+        """返回 (忙碌时间, 总时间)"""
+        with open('/proc/stat', 'r') as f:
+            values = [float(v) for v in f.readline().split()[1:]]
+        idle = values[3] + (values[4] if len(values) > 4 else 0.0)
+        return sum(values) - idle, sum(values)
+
+    @staticmethod
+    def _read_psutil() -> Tuple[float, float]:
+        import psutil
+
+        times = psutil.cpu_times()
+        total = sum(times)
+        return total - times.idle - getattr(times, 'iowait', 0.0), total
+
+    @staticmethod
+    def _read_windows() -> Tuple[float, float]:
+        import ctypes
+        from ctypes import wintypes
+
+        idle, kernel, user = wintypes.FILETIME(), wintypes.FILETIME(), wintypes.FILETIME()
+        if not ctypes.windll.kernel32.GetSystemTimes(ctypes.byref(idle), ctypes.byref(kernel), ctypes.byref(user)):
+            raise OSError("GetSystemTimes 调用失败")
+
+        def seconds(filetime) -> float:
+            return ((filetime.dwHighDateTime << 32) | filetime.dwLowDateTime) / 1e7
+
+        # 内核时间包含空闲时间
+        total = seconds(kernel) + seconds(user)
+        return total - seconds(idle), total
+
+    def _read_process(self) -> Tuple[float, float]:
+        times = os.times()
+        busy = times.user + times.system + times.children_user + times.children_system
+        return busy, time.monotonic() * self._cpu_count
+
+    def sample(self) -> Optional[float]:
+        """返回距上次采样期间的 CPU 利用率 (0-100)，无法采样时返回 None"""
+        if self._reader is None:
+            return None
+        try:
+            current = self._reader()
+        except (OSError, ValueError, IndexError):
+            return None
+        busy = current[0] - self._last[0]
+        total = current[1] - self._last[1]
+        self._last = current
+        if total <= 0:
+            # 两次采样间隔小于时钟精度，没有有效数据
+            return None
+        return max(0.0, min(100.0, busy / total * 100))
+
+
+class WorkerAutoScaler:
+    """根据 CPU 利用率、负载、队列积压和各阶段耗时调整压缩包 worker 数量
+
+    - CPU 利用率或每核负载过高时减少 worker
+    - 队列还有积压且没有因临时空间不足而排队时，CPU 低于 cpu_low 就增加 worker；
+      上传等网络阶段耗时占比达到 io_share_high 时，worker 大部分时间在等网络，
+      只要 CPU 低于 cpu_high 也继续增加
+    每次决策都会输出日志，便于调整上下限和阈值。
+    """
+
+    def __init__(self, logger: FanTwoLogger, min_workers: int, max_workers: int, initial: int,
+                 backlog: Callable[[], int], interval: float = 10.0, cpu_high: float = 90.0,
+                 cpu_low: float = 60.0, load_high: float = 1.5, io_share_high: float = 0.5,
+                 admission_waiting: Optional[Callable[[], int]] = None, process_mode: bool = False):
+        self.logger = logger
+        self.min_workers = max(1, min_workers)
+        self.max_workers = max(self.min_workers, max_workers)
+        self.target = max(self.min_workers, min(self.max_workers, initial))
+        self.backlog = backlog
+        self.interval = interval
+        self.cpu_high = cpu_high
+        self.cpu_low = cpu_low
+        self.load_high = load_high
+        self.io_share_high = io_share_high
+        self.admission_waiting = admission_waiting
+
+        self._cpu = _CpuSampler(allow_process_fallback=not process_mode)
+        if self._cpu.source is None:
+            self.logger.warning("无法获取系统 CPU 利用率（可安装 psutil），自动扩缩容不会根据 CPU 增减 worker")
+        self._cpu_count = os.cpu_count() or 1
+        self._stage_times: Dict[str, float] = {}
+        self._io_share_value: Optional[float] = None
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def record_stages(self, stages: Dict[str, float]):
+        """累计已完成压缩包的各阶段耗时"""
+        with self._lock:
+            for stage, elapsed in stages.items():
+                self._stage_times[stage] = self._stage_times.get(stage, 0.0) + elapsed
+
+    def _io_share(self) -> Optional[float]:
+        """取出本周期内网络阶段耗时占比，本周期没有完成的压缩包时沿用上一次的值，从未有数据时返回 None"""
+        with self._lock:
+            stage_times, self._stage_times = self._stage_times, {}
+        total = sum(stage_times.values())
+        if total > 0:
+            self._io_share_value = sum(stage_times.get(stage, 0.0) for stage in IO_STAGES) / total
+        return self._io_share_value
+
+    def _load_per_core(self) -> Optional[float]:
+        """1 分钟平均负载除以核数，Windows 不支持时返回 None"""
+        try:
+            return os.getloadavg()[0] / self._cpu_count
+        except (AttributeError, OSError):
+            return None
+
+    def decide(self) -> int:
+        """采样一次并返回新的目标 worker 数"""
+        cpu = self._cpu.sample()
+        load = self._load_per_core()
+        backlog = self.backlog()
+        io_share = self._io_share()
+        waiting = self.admission_waiting() if self.admission_waiting else 0
+
+        current = self.target
+        target, reason = current, "保持"
+        io_bound = io_share is not None and io_share >= self.io_share_high
+        # 无法采样 CPU 时不扩容，避免在机器已经饱和时继续增加 worker
+        can_grow = cpu is not None and backlog > 0 and not waiting and current < self.max_workers
+        if (cpu is not None and cpu >= self.cpu_high) or (load is not None and load >= self.load_high):
+            if current > self.min_workers:
+                target, reason = current - 1, "CPU 饱和"
+        elif can_grow and cpu < self.cpu_low:
+            target, reason = current + 1, "CPU 空闲且有积压"
+        elif can_grow and io_bound:
+            # CPU 介于 cpu_low 和 cpu_high 之间，但 worker 主要在等网络，增加并发仍能提高吞吐
+            target, reason = current + 1, "等待网络为主，CPU 仍有余量"
+
+        detail = (f"CPU {'-' if cpu is None else f'{cpu:.0f}%'}, 每核负载 {'-' if load is None else f'{load:.2f}'}, 队列 {backlog}, "
+                  f"上传耗时占比 {'-' if io_share is None else f'{io_share:.0%}'}, 等待临时空间 {waiting}")
+        if target != current:
+            self.logger.info(f"自动扩缩容: {current} -> {target} ({reason}; {detail})")
+            self.target = target
+        else:
+            self.logger.debug(f"自动扩缩容: 保持 {current} ({detail})")
+        return self.target
+
+    def _loop(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.decide()
+            except Exception as e:
+                self.logger.error(f"自动扩缩容采样失败: {e}")
+
+    def start(self):
+        """启动后台决策线程"""
+        if self._thread is None:
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._loop, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """停止后台决策线程"""
+        if self._thread is not None:
+            self._stop_event.set()
+            self._thread.join()
+            self._thread = None
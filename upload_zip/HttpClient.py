@@ -7,6 +7,7 @@ from typing import List, Dict, Any, Optional, Tuple
 import requests
 
 from FanTwoLogger import FanTwoLogger
+from Metrics import HTTP_REQUESTS, HTTP_DURATION, HTTP_RETRIES, STAGE_BYTES
 
 
 class PicartHTTPClient:
@@ -57,6 +58,9 @@ class PicartHTTPClient:
             return None
 
         for attempt in range(max_retries):
+            if attempt > 0:
+                HTTP_RETRIES.labels('upload').inc()
+            start_time = time.perf_counter()
             try:
                 with open(file_path, 'rb') as f:
                     mime_type = self.get_mime_type(file_path.name)
@@ -68,11 +72,14 @@ class PicartHTTPClient:
                         headers=self.headers,
                         timeout=60
                     )
+                    HTTP_DURATION.labels('upload').observe(time.perf_counter() - start_time)
+                    HTTP_REQUESTS.labels('upload', response.status_code).inc()
 
                     if response.status_code in [200, 201]:
                         result = response.json()
                         if result.get('code') in [0, 200]:
                             self.logger.success(f"✓ 上传成功: {file_path.name}")
+                            STAGE_BYTES.labels('upload', 'out').inc(file_path.stat().st_size)
                             return result.get('data')[0]
                         else:
                             self.logger.error(f"✗ 业务错误 {file_path.name}: {result.get('message')}")
@@ -84,10 +91,13 @@ class PicartHTTPClient:
                             return None
 
             except requests.exceptions.Timeout:
+                HTTP_REQUESTS.labels('upload', 'timeout').inc()
                 self.logger.warning(f"✗ 上传超时 {file_path.name} (尝试 {attempt + 1}/{max_retries})")
                 if attempt == max_retries - 1:
                     return None
             except Exception as e:
+                if isinstance(e, requests.exceptions.RequestException):
+                    HTTP_REQUESTS.labels('upload', 'error').inc()
                 self.logger.error(f"✗ 上传错误 {file_path.name}: {e}")
                 if attempt == max_retries - 1:
                     return None
@@ -144,6 +154,7 @@ class PicartHTTPClient:
             self.logger.error("未配置创建URL")
             return False, None
 
+        start_time = time.perf_counter()
         try:
             response = self.session.post(
                 create_url,
@@ -151,6 +162,8 @@ class PicartHTTPClient:
                 headers=self.headers,
                 timeout=30
             )
+            HTTP_DURATION.labels('create').observe(time.perf_counter() - start_time)
+            HTTP_REQUESTS.labels('create', response.status_code).inc()
 
             if response.status_code in [200, 201]:
                 result = response.json()
@@ -165,6 +178,8 @@ class PicartHTTPClient:
                 return False, None
 
         except Exception as e:
+            if isinstance(e, requests.exceptions.RequestException):
+                HTTP_REQUESTS.labels('create', 'timeout' if isinstance(e, requests.exceptions.Timeout) else 'error').inc()
             self.logger.error(f"✗ 发布提交失败: {e}")
             return False, None
 
@@ -0,0 +1,317 @@
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _escape(value: str) -> str:
+    """转义标签值"""
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    """格式化标签，例如 {stage="extract",direction="in"}"""
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    """格式化数值，整数不带小数点"""
+    if value != value:
+        return "NaN"
+    if value in (float('inf'), float('-inf')):
+        return "+Inf" if value > 0 else "-Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _CounterChild:
+    """单个标签组合的计数器"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount: float = 1):
+        """增加计数"""
+        with self._lock:
+            self.value += amount
+
+    def drain(self) -> float:
+        """读取并清零，用于把子进程的增量合并回父进程"""
+        with self._lock:
+            value, self.value = self.value, 0.0
+        return value
+
+    def merge(self, value: float):
+        """合并增量"""
+        self.inc(value)
+
+
+class _GaugeChild:
+    """单个标签组合的仪表值，可绑定函数在采集时取值"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._value = 0.0
+        self._function: Optional[Callable[[], float]] = None
+
+    @property
+    def value(self) -> float:
+        if self._function is not None:
+            try:
+                return float(self._function())
+            except Exception:
+                return float('nan')
+        return self._value
+
+    def set(self, value: float):
+        """设置当前值"""
+        with self._lock:
+            self._value = value
+
+    def inc(self, amount: float = 1):
+        """增加当前值"""
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1):
+        """减少当前值"""
+        self.inc(-amount)
+
+    def set_function(self, function: Callable[[], float]):
+        """采集时调用 function 取值，热路径上没有额外开销"""
+        self._function = function
+
+
+class _HistogramChild:
+    """单个标签组合的直方图"""
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self._lock = threading.Lock()
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        """记录一个观测值"""
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def drain(self) -> Tuple[List[int], float]:
+        """读取并清零"""
+        with self._lock:
+            counts, total = self.counts, self.sum
+            self.counts, self.sum = [0] * len(counts), 0.0
+        return counts, total
+
+    def merge(self, value: Tuple[List[int], float]):
+        """合并增量"""
+        counts, total = value
+        with self._lock:
+            for i, count in enumerate(counts):
+                self.counts[i] += count
+            self.sum += total
+
+
+class _Metric:
+    """指标基类，按标签值管理子指标"""
+
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 registry: Optional['MetricsRegistry'] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """获取指定标签值的子指标，热路径上建议提前获取并复用"""
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"指标 {self.name} 需要标签 {self.labelnames}，实际为 {values}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _items(self):
+        with self._lock:
+            return list(self._children.items())
+
+    def expose(self) -> List[str]:
+        """输出文本格式"""
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """只增不减的计数器"""
+
+    type_name = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1):
+        """无标签时直接增加计数"""
+        self.labels().inc(amount)
+
+    def expose(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}"
+                for key, child in self._items()]
+
+
+class Gauge(_Metric):
+    """可增可减的仪表值"""
+
+    type_name = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+    def inc(self, amount: float = 1):
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1):
+        self.labels().dec(amount)
+
+    def set_function(self, function: Callable[[], float]):
+        self.labels().set_function(function)
+
+    def expose(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}"
+                for key, child in self._items()]
+
+
+class Histogram(_Metric):
+    """直方图，按 buckets 统计分布"""
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS, registry: Optional['MetricsRegistry'] = None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def expose(self) -> List[str]:
+        lines = []
+        for key, child in self._items():
+            with child._lock:
+                counts, total = list(child.counts), child.sum
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"指标已注册: {metric.name}")
+            self._metrics[metric.name] = metric
+
+    def expose(self) -> str:
+        """输出 Prometheus 文本格式"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            lines.extend(metric.expose())
+        return "\n".join(lines) + "\n"
+
+    def drain(self) -> Dict[str, Dict[Tuple[str, ...], object]]:
+        """读取计数器和直方图的增量并清零，用于进程模式下回传给父进程"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        delta = {}
+        for metric in metrics:
+            if isinstance(metric, (Counter, Histogram)):
+                values = {key: child.drain() for key, child in metric._items()}
+                if values:
+                    delta[metric.name] = values
+        return delta
+
+    def merge(self, delta: Dict[str, Dict[Tuple[str, ...], object]]):
+        """合并子进程回传的增量"""
+        for name, values in delta.items():
+            metric = self._metrics.get(name)
+            if metric is None:
+                continue
+            for key, value in values.items():
+                metric.labels(*key).merge(value)
+
+
+REGISTRY = MetricsRegistry()
+
+
+def start_http_server(port: int, host: str = '127.0.0.1', registry: MetricsRegistry = REGISTRY):
+    """在后台线程中启动 /metrics 端点"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] not in ('/', '/metrics'):
+                self.send_error(404)
+                return
+            body = registry.expose().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# 处理流程中使用的指标
+ARCHIVES_PROCESSED = Counter('sugarless_archives_processed_total', '处理完成的压缩包数量', ('result',))
+ARCHIVE_DURATION = Histogram('sugarless_archive_duration_seconds', '单个压缩包处理耗时')
+ARCHIVES_IN_PROGRESS = Gauge('sugarless_archives_in_progress', '正在处理的压缩包数量')
+STAGE_DURATION = Histogram('sugarless_stage_duration_seconds', '各处理阶段耗时', ('stage',))
+IMAGES_TRANSCODED = Counter('sugarless_images_transcoded_total', '图片转码数量', ('result',))
+STAGE_BYTES = Counter('sugarless_stage_bytes_total', '各阶段输入/输出字节数', ('stage', 'direction'))
+QUEUE_DEPTH = Gauge('sugarless_queue_depth', '队列中等待的任务数', ('queue',))
+HTTP_REQUESTS = Counter('sugarless_http_requests_total', 'HTTP 请求数，code 为状态码、timeout 或 error',
+                        ('endpoint', 'code'))
+HTTP_DURATION = Histogram('sugarless_http_request_duration_seconds', 'HTTP 请求耗时', ('endpoint',))
+HTTP_RETRIES = Counter('sugarless_http_retries_total', 'HTTP 重试次数', ('endpoint',))
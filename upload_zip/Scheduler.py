@@ -0,0 +1,71 @@
+import heapq
+import re
+from typing import Callable, Dict, List, Any
+
+# 文件名中的优先级标签，例如 "[prio=5] xxx.zip"，数值越大越先处理
+PRIORITY_PATTERN = re.compile(r'\[\s*prio(?:rity)?\s*[=:]\s*(-?\d+)\s*\]', re.IGNORECASE)
+
+SCHEDULE_POLICIES: Dict[str, Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]]] = {}
+
+
+def register_policy(name: str):
+    """注册调度策略，策略函数接收任务列表并返回排序后的新列表"""
+
+    def decorator(func):
+        SCHEDULE_POLICIES[name] = func
+        return func
+
+    return decorator
+
+
+@register_policy('fifo')
+def _fifo(jobs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """按扫描顺序处理"""
+    return list(jobs)
+
+
+@register_policy('lpt')
+def _longest_first(jobs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """最长任务优先，缩短总耗时（makespan）"""
+    return sorted(jobs, key=lambda job: job['cost'], reverse=True)
+
+
+@register_policy('spt')
+def _shortest_first(jobs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """最短任务优先，降低平均等待时间"""
+    return sorted(jobs, key=lambda job: job['cost'])
+
+
+@register_policy('priority')
+def _priority_first(jobs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """按文件名优先级标签处理，同优先级内最长任务优先"""
+    return sorted(jobs, key=lambda job: (-job['priority'], -job['cost']))
+
+
+def parse_priority(name: str) -> int:
+    """读取文件名中的优先级标签，没有标签时为 0"""
+    match = PRIORITY_PATTERN.search(name)
+    return int(match.group(1)) if match else 0
+
+
+def estimate_cost(size: int, members: int, member_cost_bytes: int) -> int:
+    """估算处理开销：解压后大小加上按文件数折算的固定开销（图片转码、上传请求）"""
+    return size + members * member_cost_bytes
+
+
+def order_jobs(jobs: List[Dict[str, Any]], policy: str) -> List[Dict[str, Any]]:
+    """按策略排序任务"""
+    if policy not in SCHEDULE_POLICIES:
+        raise ValueError(f"不支持的调度策略: {policy}. 支持的策略: {', '.join(SCHEDULE_POLICIES)}")
+    return SCHEDULE_POLICIES[policy](jobs)
+
+
+def simulate_makespan(durations: List[float], workers: int) -> float:
+    """模拟按顺序把任务分配给最早空闲的 worker，返回预计总耗时"""
+    if not durations:
+        return 0.0
+    finish_times = [0.0] * max(1, workers)
+    for duration in durations:
+        earliest = heapq.heappop(finish_times)
+        heapq.heappush(finish_times, earliest + duration)
+    return max(finish_times)
@@ -0,0 +1,331 @@
+import json
+import os
+import queue
+import shutil
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple, Any
+
+from FanTwoLogger import FanTwoLogger
+
+
+class PostSubmitQueue:
+    """后台发布队列，压缩包上传完图片后把发布请求写入 SQLite，由后台线程提交
+
+    worker 不再等待发布接口和临时目录删除，可以直接处理下一个压缩包。发布请求先落盘再
+    提交，程序中途退出后未提交的请求会在下次运行时继续提交；提交失败按指数退避重试，
+    超过最大次数后标记为失败，运行结束时统一汇报。进程模式下 worker 进程只写入队列，
+    由主进程的后台线程负责提交。
+
+    多个进程共用同一个数据库时，每条记录属于写入它的进程（owner），各进程只提交自己的
+    记录；owner 超过 owner_timeout 没有心跳（已退出）时，遗留的记录由其他进程接手。
+    """
+
+    STATUS_PENDING = 'pending'
+    STATUS_SENDING = 'sending'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+
+    def __init__(self, db_path: str, logger: FanTwoLogger,
+                 submit: Optional[Callable[[Dict], Tuple[bool, Optional[Dict]]]] = None,
+                 workers: int = 2, max_attempts: int = 3, retry_seconds: float = 5.0,
+                 stale_seconds: float = 120.0,
+                 on_finished: Optional[Callable[[int, str, bool], None]] = None,
+                 owner: Optional[str] = None, owner_timeout: float = 60.0):
+        self.db_path = db_path
+        self.logger = logger
+        self.submit = submit
+        # 请求有最终结果（成功或达到最大重试次数）时回调，参数为 (记录 id, 压缩包名, 是否成功)
+        self.on_finished = on_finished
+        self.workers = max(1, workers)
+        self.max_attempts = max(1, max_attempts)
+        self.retry_seconds = retry_seconds
+        # 提交中的记录超过该时间未更新，视为提交进程已退出，重新提交；单次提交最长 30s 超时
+        self.stale_seconds = stale_seconds
+        # 进程模式下 worker 进程使用主进程的 owner 写入，由主进程提交
+        self.owner = owner or f"{socket.gethostname()}-{os.getpid()}"
+        self.owner_timeout = owner_timeout
+
+        self._outcomes: List[Dict[str, Any]] = []
+        self._outcomes_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closing = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._cleanup_queue: "queue.Queue[Optional[Path]]" = queue.Queue()
+        self._cleanup_thread = None
+        self._owner_thread = None
+        self._owner_stop = threading.Event()
+
+        self._init_db()
+
+    @contextmanager
+    def _connect(self):
+        """每次操作使用独立连接，避免跨线程共享 sqlite3 连接"""
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _init_db(self):
+        """创建发布请求表"""
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS submissions ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " archive TEXT NOT NULL,"
+                " payload TEXT NOT NULL,"
+                " status TEXT NOT NULL,"
+                " attempts INTEGER NOT NULL DEFAULT 0,"
+                " next_try REAL NOT NULL DEFAULT 0,"
+                " error TEXT,"
+                " response TEXT,"
+                " created REAL NOT NULL DEFAULT 0,"
+                " updated REAL NOT NULL DEFAULT 0,"
+                " owner TEXT)"
+            )
+            # 兼容旧版本创建的数据库，旧记录没有 owner，任何进程都可以接手
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(submissions)")]
+            if 'owner' not in columns:
+                conn.execute("ALTER TABLE submissions ADD COLUMN owner TEXT")
+            conn.execute("CREATE TABLE IF NOT EXISTS owners (owner TEXT PRIMARY KEY, seen REAL NOT NULL)")
+
+    def _claimable(self) -> Tuple[str, Tuple[str, float]]:
+        """本进程可以提交的记录条件：自己写入的，或者 owner 已经没有心跳的遗留记录"""
+        return ("(owner = ? OR owner IS NULL OR owner NOT IN (SELECT owner FROM owners WHERE seen >= ?))",
+                (self.owner, time.time() - self.owner_timeout))
+
+    @property
+    def running(self) -> bool:
+        """后台线程是否已启动"""
+        return bool(self._threads)
+
+    def enqueue(self, archive: str, payload: Dict) -> int:
+        """写入一条待提交的发布请求，返回记录 id"""
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT INTO submissions (archive, payload, status, created, updated, owner) VALUES (?, ?, ?, ?, ?, ?)",
+                (archive, json.dumps(payload, ensure_ascii=False), self.STATUS_PENDING, now, now, self.owner)
+            )
+            submission_id = cursor.lastrowid
+        self._wakeup.set()
+        return submission_id
+
+    def _claim(self) -> Optional[Tuple[int, str, Dict, int]]:
+        """领取一条本进程可以提交的到期记录，没有时返回 None；接手的遗留记录改为属于本进程"""
+        now = time.time()
+        claimable, params = self._claimable()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT id, archive, payload, attempts, status, owner FROM submissions"
+                    " WHERE ((status = ? AND next_try <= ?) OR (status = ? AND updated < ?)) AND " + claimable +
+                    " ORDER BY id LIMIT 1",
+                    (self.STATUS_PENDING, now, self.STATUS_SENDING, now - self.stale_seconds) + params
+                ).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                submission_id, archive, payload, attempts, status, owner = row
+                conn.execute(
+                    "UPDATE submissions SET status = ?, attempts = attempts + 1, updated = ?, owner = ? WHERE id = ?",
+                    (self.STATUS_SENDING, now, self.owner, submission_id)
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+        if status == self.STATUS_SENDING:
+            self.logger.warning(f"重新提交中断的发布请求: {archive}")
+        elif owner != self.owner:
+            self.logger.warning(f"接手已退出进程遗留的发布请求: {archive} (原 owner: {owner})")
+        return submission_id, archive, json.loads(payload), attempts + 1
+
+    def _finish(self, submission_id: int, archive: str, attempts: int, success: bool,
+                response: Optional[Dict], error: Optional[str]):
+        """记录一次提交结果，失败且未超过最大次数时安排重试"""
+        now = time.time()
+        if success:
+            status, next_try = self.STATUS_DONE, 0.0
+        elif attempts < self.max_attempts:
+            status, next_try = self.STATUS_PENDING, now + self.retry_seconds * 2 ** (attempts - 1)
+        else:
+            status, next_try = self.STATUS_FAILED, 0.0
+
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE submissions SET status = ?, next_try = ?, error = ?, response = ?, updated = ? WHERE id = ?",
+                (status, next_try, error,
+                 json.dumps(response, ensure_ascii=False) if response is not None else None, now, submission_id)
+            )
+
+        if status == self.STATUS_PENDING:
+            self.logger.warning(f"发布提交失败，{next_try - now:.1f}s 后重试 ({attempts}/{self.max_attempts}): {archive}")
+            return
+        with self._outcomes_lock:
+            self._outcomes.append({'archive': archive, 'success': success, 'attempts': attempts,
+                                   'response': response, 'error': error})
+        if success:
+            self.logger.success(f"发布完成: {archive}")
+            self.logger.success(response)
+        else:
+            self.logger.error(f"发布失败，已达最大重试次数: {archive} ({error})")
+        if self.on_finished is not None:
+            try:
+                self.on_finished(submission_id, archive, success)
+            except Exception as e:
+                self.logger.error(f"处理发布结果回调出错 {archive}: {e}")
+
+    def pending_count(self) -> int:
+        """本进程负责的尚未完成的记录数，包括等待重试和正在提交的；其他进程的记录不等待"""
+        claimable, params = self._claimable()
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT COUNT(*) FROM submissions WHERE (status = ? OR (status = ? AND updated >= ?)) AND " + claimable,
+                (self.STATUS_PENDING, self.STATUS_SENDING, time.time() - self.stale_seconds) + params
+            ).fetchone()[0]
+
+    def _touch_owner(self):
+        """更新本进程的心跳"""
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO owners (owner, seen) VALUES (?, ?)", (self.owner, time.time()))
+
+    def _owner_loop(self):
+        """后台心跳线程，表明本进程仍在提交自己的记录，close 等待重试期间也保持心跳"""
+        while not self._owner_stop.wait(self.owner_timeout / 4):
+            try:
+                self._touch_owner()
+            except sqlite3.Error as e:
+                self.logger.error(f"更新发布队列心跳出错: {e}")
+
+    def _submit_loop(self):
+        """后台提交线程"""
+        while True:
+            try:
+                claimed = self._claim()
+            except sqlite3.Error as e:
+                self.logger.error(f"读取发布队列出错: {e}")
+                claimed = None
+
+            if claimed is None:
+                if self._closing.is_set() and self.pending_count() == 0:
+                    break
+                self._wakeup.wait(1.0)
+                self._wakeup.clear()
+                continue
+
+            submission_id, archive, payload, attempts = claimed
+            try:
+                success, response = self.submit(payload)
+                error = None if success else (response or {}).get('message') or "HTTP 或网络错误"
+            except Exception as e:
+                success, response, error = False, None, str(e)
+            try:
+                self._finish(submission_id, archive, attempts, success, response, error)
+            except sqlite3.Error as e:
+                # 记录保持提交中状态，过期后会被重新领取
+                self.logger.error(f"记录发布结果出错 {archive}: {e}")
+
+    def _cleanup_loop(self):
+        """后台删除临时目录"""
+        while True:
+            path = self._cleanup_queue.get()
+            if path is None:
+                break
+            try:
+                shutil.rmtree(path)
+            except OSError as e:
+                self.logger.error(f"删除临时目录失败 {path}: {e}")
+
+    def defer_cleanup(self, path: Path):
+        """在后台删除临时目录，后台线程未启动（如 worker 进程中）时直接删除"""
+        if self._cleanup_thread is None:
+            shutil.rmtree(path)
+        else:
+            self._cleanup_queue.put(path)
+
+    def start(self):
+        """启动后台提交线程和清理线程，同时接手上次运行遗留的记录"""
+        if self.running:
+            return
+        if self.submit is None:
+            raise ValueError("未提供发布函数，无法启动发布队列")
+        self._touch_owner()
+        # 已退出进程遗留的请求不再等待退避时间，立即重新提交；仍在运行的进程的记录不动
+        claimable, params = self._claimable()
+        with self._connect() as conn:
+            conn.execute("UPDATE submissions SET next_try = 0 WHERE status = ? AND owner IS NOT ? AND " + claimable,
+                         (self.STATUS_PENDING, self.owner) + params)
+        self._closing.clear()
+        self._owner_stop.clear()
+        self._owner_thread = threading.Thread(target=self._owner_loop, daemon=True)
+        self._owner_thread.start()
+        self._threads = [threading.Thread(target=self._submit_loop, daemon=True) for _ in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+        self._cleanup_thread = threading.Thread(target=self._cleanup_loop, daemon=True)
+        self._cleanup_thread.start()
+
+    def close(self):
+        """等待队列中的发布请求全部提交（含重试）和临时目录全部删除后停止后台线程"""
+        self._closing.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        if self._owner_thread is not None:
+            self._owner_stop.set()
+            self._owner_thread.join()
+            self._owner_thread = None
+            # 本进程不再提交，剩余的记录立即可以被其他进程接手
+            with self._connect() as conn:
+                conn.execute("DELETE FROM owners WHERE owner = ?", (self.owner,))
+        if self._cleanup_thread is not None:
+            self._cleanup_queue.put(None)
+            self._cleanup_thread.join()
+            self._cleanup_thread = None
+
+    def outcomes(self) -> List[Dict[str, Any]]:
+        """本次运行中已经有最终结果的发布请求"""
+        with self._outcomes_lock:
+            return list(self._outcomes)
+
+    def statuses(self, submission_ids: List[int]) -> Dict[int, str]:
+        """查询指定记录的当前状态"""
+        if not submission_ids:
+            return {}
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT id, status FROM submissions WHERE id IN ({', '.join('?' * len(submission_ids))})",
+                list(submission_ids)
+            ).fetchall()
+        return dict(rows)
+
+    def status_counts(self) -> Dict[str, int]:
+        """按状态统计记录数量"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) FROM submissions GROUP BY status").fetchall()
+        return dict(rows)
+
+    @staticmethod
+    def read_status_counts(db_path: str) -> Optional[Dict[str, int]]:
+        """以只读方式按状态统计记录数量，不创建数据库文件，数据库不存在时返回 None"""
+        if not Path(db_path).is_file():
+            return None
+        conn = sqlite3.connect(Path(db_path).resolve().as_uri() + '?mode=ro', uri=True, timeout=30)
+        try:
+            rows = conn.execute("SELECT status, COUNT(*) FROM submissions GROUP BY status").fetchall()
+        except sqlite3.OperationalError:
+            # 数据库文件存在但还没有建表
+            return {}
+        finally:
+            conn.close()
+        return dict(rows)
@@ -0,0 +1,106 @@
+import shutil
+import threading
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict
+
+from FanTwoLogger import FanTwoLogger
+
+
+class TempDiskBudget:
+    """临时目录磁盘预算，控制同时解压的压缩包占用的临时空间
+
+    每个压缩包在解压前按声明的解压后大小预留空间，只有预计占用不超过
+    budget 且磁盘剩余空间不低于 min_free 时才放行。按申请顺序依次放行，
+    避免大压缩包一直被小压缩包插队。单个压缩包超出预算时，等其他任务
+    全部结束后单独运行，而不是直接失败。
+    """
+
+    def __init__(self, temp_dir: Path, logger: FanTwoLogger, budget_bytes: int = 0, min_free_bytes: int = 0):
+        self.temp_dir = temp_dir
+        self.logger = logger
+        self.budget_bytes = budget_bytes
+        self.min_free_bytes = min_free_bytes
+
+        self._reserved: Dict[str, int] = {}
+        self._waiting = deque()
+        self._condition = threading.Condition()
+
+    @property
+    def reserved_bytes(self) -> int:
+        """当前已预留的空间"""
+        return sum(self._reserved.values())
+
+    @property
+    def waiting_count(self) -> int:
+        """正在排队等待空间的任务数"""
+        return len(self._waiting)
+
+    def _free_bytes(self) -> int:
+        """临时目录所在磁盘的剩余空间"""
+        self.temp_dir.mkdir(parents=True, exist_ok=True)
+        return shutil.disk_usage(self.temp_dir).free
+
+    def _fits(self, size: int) -> bool:
+        """判断预留 size 后是否仍在预算内"""
+        reserved = self.reserved_bytes
+        if not self._reserved:
+            # 没有其他任务在运行时总是放行，超大压缩包单独运行
+            return True
+        if self.budget_bytes and reserved + size > self.budget_bytes:
+            return False
+        # 保守估计：已预留的任务可能还没写入磁盘，需要从剩余空间中扣除
+        if self.min_free_bytes and self._free_bytes() - reserved - size < self.min_free_bytes:
+            return False
+        return True
+
+    def _admit(self, name: str, size: int):
+        """记录预留并输出日志"""
+        if not self._reserved and (
+                (self.budget_bytes and size > self.budget_bytes)
+                or (self.min_free_bytes and self._free_bytes() - size < self.min_free_bytes)):
+            self.logger.warning(f"压缩包预计占用 {size / 1024 / 1024:.1f} MB 超出临时空间预算，单独运行: {name}")
+        self._reserved[name] = size
+        self.logger.debug(
+            f"临时空间预留 {size / 1024 / 1024:.1f} MB: {name}，当前合计 {self.reserved_bytes / 1024 / 1024:.1f} MB"
+        )
+
+    def try_acquire(self, name: str, size: int) -> bool:
+        """尝试预留空间，不阻塞；有其他任务在排队时不插队"""
+        with self._condition:
+            if self._waiting or not self._fits(size):
+                return False
+            self._admit(name, size)
+            return True
+
+    def acquire(self, name: str, size: int):
+        """预留空间，空间不足时阻塞等待，按申请顺序放行"""
+        with self._condition:
+            self._waiting.append(name)
+            try:
+                announced = False
+                while self._waiting[0] != name or not self._fits(size):
+                    if not announced and self._waiting[0] == name:
+                        self.logger.info(f"临时空间不足，等待其他任务完成: {name}")
+                        announced = True
+                    self._condition.wait(timeout=5)
+                self._admit(name, size)
+            finally:
+                self._waiting.remove(name)
+                self._condition.notify_all()
+
+    def release(self, name: str):
+        """释放预留的空间"""
+        with self._condition:
+            self._reserved.pop(name, None)
+            self._condition.notify_all()
+
+    @contextmanager
+    def reserve(self, name: str, size: int):
+        """在 with 块内持有预留空间"""
+        self.acquire(name, size)
+        try:
+            yield
+        finally:
+            self.release(name)
@@ -0,0 +1,216 @@
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Dict, Optional, Set
+
+from FanTwoLogger import FanTwoLogger
+
+
+class LeaseWorkQueue:
+    """基于 SQLite 租约的共享任务队列，多台机器/多个进程共同消费同一个源目录
+
+    每个压缩包在数据库中对应一行记录，worker 通过 claim 领取租约，处理期间由
+    后台线程定期续约，完成后标记为 done/failed。worker 崩溃后租约过期，其他
+    worker 会自动重新领取。数据库文件需放在所有 worker 都能访问的共享存储上。
+    """
+
+    STATUS_PENDING = 'pending'
+    STATUS_LEASED = 'leased'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+
+    def __init__(self, db_path: str, logger: FanTwoLogger, lease_seconds: int = 300,
+                 heartbeat_seconds: int = 60, max_attempts: int = 3, worker_id: Optional[str] = None):
+        self.db_path = db_path
+        self.logger = logger
+        self.lease_seconds = lease_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self.max_attempts = max_attempts
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+
+        self._held = set()
+        self._held_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._heartbeat_thread = None
+
+        self._init_db()
+
+    @contextmanager
+    def _connect(self):
+        """每次操作使用独立连接，避免跨线程共享 sqlite3 连接"""
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _init_db(self):
+        """创建租约表"""
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS leases ("
+                " name TEXT PRIMARY KEY,"
+                " status TEXT NOT NULL,"
+                " owner TEXT,"
+                " expires REAL NOT NULL DEFAULT 0,"
+                " attempts INTEGER NOT NULL DEFAULT 0,"
+                " updated REAL NOT NULL DEFAULT 0,"
+                " position INTEGER NOT NULL DEFAULT 0)"
+            )
+            # 兼容旧版本创建的数据库
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(leases)")]
+            if 'position' not in columns:
+                conn.execute("ALTER TABLE leases ADD COLUMN position INTEGER NOT NULL DEFAULT 0")
+
+    def register(self, names: List[str]) -> int:
+        """登记待处理的压缩包，按 names 的顺序领取；已存在的记录只更新待处理任务的顺序，返回新增数量"""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO leases (name, status, updated, position) VALUES (?, ?, ?, ?)",
+                [(name, self.STATUS_PENDING, now, position) for position, name in enumerate(names)]
+            )
+            added = conn.total_changes - before
+            conn.executemany(
+                "UPDATE leases SET position = ? WHERE name = ? AND status = ?",
+                [(position, name, self.STATUS_PENDING) for position, name in enumerate(names)]
+            )
+            conn.execute("COMMIT")
+        return added
+
+    def unfinished(self, names: List[str]) -> Set[str]:
+        """返回 names 中尚未登记或仍待处理的压缩包名"""
+        with self._connect() as conn:
+            settled = {row[0] for row in conn.execute(
+                "SELECT name FROM leases WHERE status != ?", (self.STATUS_PENDING,))}
+        return {name for name in names if name not in settled}
+
+    def claim(self) -> Optional[str]:
+        """领取一个待处理或租约已过期的压缩包，没有可领取的任务时返回 None"""
+        now = time.time()
+        with self._connect() as conn:
+            # BEGIN IMMEDIATE 获取写锁，保证同一时刻只有一个 worker 在分配任务
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # 超过最大尝试次数的过期租约直接标记为失败，避免坏文件反复拖垮 worker
+                conn.execute(
+                    "UPDATE leases SET status = ?, owner = NULL, updated = ?"
+                    " WHERE status = ? AND expires < ? AND attempts >= ?",
+                    (self.STATUS_FAILED, now, self.STATUS_LEASED, now, self.max_attempts)
+                )
+                row = conn.execute(
+                    "SELECT name, status, owner FROM leases"
+                    " WHERE status = ? OR (status = ? AND expires < ?)"
+                    " ORDER BY position, updated LIMIT 1",
+                    (self.STATUS_PENDING, self.STATUS_LEASED, now)
+                ).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+
+                name, status, previous_owner = row
+                conn.execute(
+                    "UPDATE leases SET status = ?, owner = ?, expires = ?, attempts = attempts + 1, updated = ?"
+                    " WHERE name = ?",
+                    (self.STATUS_LEASED, self.worker_id, now + self.lease_seconds, now, name)
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+        if status == self.STATUS_LEASED:
+            self.logger.warning(f"回收过期租约: {name} (原持有者: {previous_owner})")
+        with self._held_lock:
+            self._held.add(name)
+        return name
+
+    def heartbeat(self, name: str) -> bool:
+        """续约，租约已被其他 worker 接管时返回 False"""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE leases SET expires = ? WHERE name = ? AND owner = ? AND status = ?",
+                (time.time() + self.lease_seconds, name, self.worker_id, self.STATUS_LEASED)
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, name: str, success: bool = True) -> bool:
+        """释放租约并记录处理结果"""
+        with self._held_lock:
+            self._held.discard(name)
+
+        status = self.STATUS_DONE if success else self.STATUS_FAILED
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE leases SET status = ?, owner = NULL, expires = 0, updated = ?"
+                " WHERE name = ? AND owner = ?",
+                (status, time.time(), name, self.worker_id)
+            )
+            if cursor.rowcount != 1:
+                self.logger.warning(f"租约已被其他 worker 接管，结果未记录: {name}")
+                return False
+        return True
+
+    def release(self, name: str):
+        """放弃租约，将任务退回队列供其他 worker 领取"""
+        with self._held_lock:
+            self._held.discard(name)
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE leases SET status = ?, owner = NULL, expires = 0, attempts = attempts - 1, updated = ?"
+                " WHERE name = ? AND owner = ?",
+                (self.STATUS_PENDING, time.time(), name, self.worker_id)
+            )
+
+    def _heartbeat_loop(self):
+        """后台续约线程"""
+        while not self._stop_event.wait(self.heartbeat_seconds):
+            with self._held_lock:
+                held = list(self._held)
+            for name in held:
+                try:
+                    if not self.heartbeat(name):
+                        self.logger.warning(f"续约失败，租约已失效: {name}")
+                except sqlite3.Error as e:
+                    self.logger.error(f"续约出错 {name}: {e}")
+
+    def start_heartbeat(self):
+        """启动后台续约线程"""
+        if self._heartbeat_thread is None:
+            self._stop_event.clear()
+            self._heartbeat_thread = threading.Thread(target=self._heartbeat_loop, daemon=True)
+            self._heartbeat_thread.start()
+
+    def stop_heartbeat(self):
+        """停止后台续约线程"""
+        if self._heartbeat_thread is not None:
+            self._stop_event.set()
+            self._heartbeat_thread.join()
+            self._heartbeat_thread = None
+
+    def status_counts(self) -> Dict[str, int]:
+        """按状态统计任务数量"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) FROM leases GROUP BY status").fetchall()
+        return dict(rows)
+
+    @staticmethod
+    def read_status_counts(db_path: str) -> Optional[Dict[str, int]]:
+        """以只读方式按状态统计任务数量，不创建数据库文件，数据库不存在时返回 None"""
+        if not Path(db_path).is_file():
+            return None
+        conn = sqlite3.connect(Path(db_path).resolve().as_uri() + '?mode=ro', uri=True, timeout=30)
+        try:
+            rows = conn.execute("SELECT status, COUNT(*) FROM leases GROUP BY status").fetchall()
+        except sqlite3.OperationalError:
+            # 数据库文件存在但还没有建表
+            return {}
+        finally:
+            conn.close()
+        return dict(rows)
@@ -1,24 +1,31 @@
+import argparse
 import bz2
 import gzip
+import io
 import lzma
 import mimetypes
+import os
 import queue
 import re
 import shutil
+import sys
 import threading
+import time
 import zipfile
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from functools import partial
 from pathlib import Path
 from queue import Queue
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 
-import py7zr
-import rarfile
-import toml
-from PIL import Image
+from FanTwoLogger import FanTwoLogger, LogAggregator, set_log_queue
+from Metrics import (REGISTRY, ARCHIVES_PROCESSED, ARCHIVE_DURATION, ARCHIVES_IN_PROGRESS, IMAGES_TRANSCODED,
+                     STAGE_BYTES, STAGE_DURATION, QUEUE_DEPTH)
+from Scheduler import PRIORITY_PATTERN, estimate_cost, order_jobs, parse_priority, simulate_makespan
 
-from FanTwoLogger import FanTwoLogger
-from HttpClient import PicartHTTPClient
+# 注意: py7zr、rarfile、PIL、requests 等较重的依赖都在首次用到时才导入，
+# 这样 scan / stats 等命令以及 --help 不需要付出完整的启动开销
 
 
 # 添加项目根目录到 Python 路径
@@ -27,15 +34,58 @@ from HttpClient import PicartHTTPClient
 # sys.path.insert(0, project_root)
 
 
-def _extract_zip(archive_path: Path, extract_dir: Path, password: str) -> bool:
-    """解压 ZIP 文件"""
+def _extract_zip(archive_path: Path, extract_dir: Path, password: str, workers: int = 1) -> bool:
+    """解压 ZIP 文件，workers > 1 时按成员并行解压"""
+    pwd = password.encode()
     with zipfile.ZipFile(archive_path, 'r') as zip_ref:
-        zip_ref.extractall(extract_dir, pwd=password.encode())
+        members = zip_ref.infolist()
+        files = [info for info in members if not info.is_dir()]
+        if workers <= 1 or len(files) < 2:
+            zip_ref.extractall(extract_dir, pwd=pwd)
+            return True
+
+        # 先用最小的加密成员校验密码，密码错误时不必启动并行解压
+        encrypted = [info for info in files if info.flag_bits & 0x1]
+        if encrypted:
+            with zip_ref.open(min(encrypted, key=lambda i: i.file_size), pwd=pwd):
+                pass
+
+        for info in members:
+            if info.is_dir():
+                zip_ref.extract(info, extract_dir)
+
+    # 按解压后大小从大到小分发，各线程从共享队列领取，尽量让线程同时结束
+    member_queue = Queue()
+    for info in sorted(files, key=lambda i: i.file_size, reverse=True):
+        member_queue.put(info)
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(files))) as executor:
+        futures = [executor.submit(_extract_zip_members, archive_path, extract_dir, pwd, member_queue)
+                   for _ in range(min(workers, len(files)))]
+        for future in futures:
+            future.result()
     return True
 
 
+def _extract_zip_members(archive_path: Path, extract_dir: Path, pwd: bytes, member_queue: Queue):
+    """并行解压线程：每个线程独立打开压缩包，从队列中领取成员解压"""
+    with zipfile.ZipFile(archive_path, 'r') as zip_ref:
+        while True:
+            try:
+                info = member_queue.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                zip_ref.extract(info, extract_dir, pwd=pwd)
+            except FileExistsError:
+                # 多个线程同时创建同一父目录时 zipfile 内部的 makedirs 可能冲突，目录已存在后重试即可
+                zip_ref.extract(info, extract_dir, pwd=pwd)
+
+
 def _extract_rar(archive_path: Path, extract_dir: Path, password: str) -> bool:
     """解压 RAR 文件"""
+    import rarfile
+
     with rarfile.RarFile(archive_path, 'r') as rar_ref:
         rar_ref.extractall(extract_dir, pwd=password)
     return True
@@ -43,41 +93,194 @@ def _extract_rar(archive_path: Path, extract_dir: Path, password: str) -> bool:
 
 def _extract_7z(archive_path: Path, extract_dir: Path, password: str) -> bool:
     """解压 7Z 文件"""
+    import py7zr
+
     with py7zr.SevenZipFile(archive_path, 'r', password=password) as zip_ref:
         zip_ref.extractall(extract_dir)
     return True
 
 
+def _zip_info(archive_path: Path, _password: str) -> Tuple[int, int]:
+    """从 ZIP 中央目录读取解压后总大小和文件数"""
+    with zipfile.ZipFile(archive_path, 'r') as zip_ref:
+        files = [info for info in zip_ref.infolist() if not info.is_dir()]
+    return sum(info.file_size for info in files), len(files)
+
+
+def _rar_info(archive_path: Path, password: str) -> Tuple[int, int]:
+    """从 RAR 文件头读取解压后总大小和文件数"""
+    import rarfile
+
+    with rarfile.RarFile(archive_path, 'r') as rar_ref:
+        if rar_ref.needs_password():
+            rar_ref.setpassword(password)
+        files = [info for info in rar_ref.infolist() if not info.is_dir()]
+    return sum(info.file_size for info in files), len(files)
+
+
+def _7z_info(archive_path: Path, password: str) -> Tuple[int, int]:
+    """从 7Z 文件头读取解压后总大小和文件数"""
+    import py7zr
+
+    with py7zr.SevenZipFile(archive_path, 'r', password=password) as zip_ref:
+        files = [info for info in zip_ref.list() if not info.is_directory]
+    return sum(info.uncompressed for info in files), len(files)
+
+
+def _folder_size(folder_path: Path) -> int:
+    """统计文件夹内所有文件的大小"""
+    return sum(f.stat().st_size for f in folder_path.rglob('*') if f.is_file())
+
+
+ARCHIVE_EXTENSIONS = ['.zip', '.rar', '.7z']
+
+ARCHIVE_INFO_READERS = {
+    '.zip': _zip_info,
+    '.rar': _rar_info,
+    '.7z': _7z_info,
+}
+
+
+def _parse_override(item: str) -> tuple:
+    """解析 section.key=value 形式的配置覆盖项，value 按 TOML 值解析，失败时作为字符串"""
+    import toml
+
+    if '=' not in item:
+        raise ValueError(f"配置覆盖项格式错误: {item}，应为 section.key=value")
+    key, raw_value = item.split('=', 1)
+    key = key.strip()
+    if not key or key.startswith('.') or key.endswith('.'):
+        raise ValueError(f"配置覆盖项格式错误: {item}，应为 section.key=value")
+    try:
+        value = toml.loads(f"v = {raw_value.strip()}")['v']
+    except Exception:
+        value = raw_value.strip()
+    return key.split('.'), value
+
+
 class ArchiveProcessor:
-    def __init__(self, config_path: str):
-        self.config = self.load_config(config_path)
+    def __init__(self, config_path: Optional[str] = None, overrides: Optional[List[str]] = None,
+                 config: Optional[Dict[str, Any]] = None):
+        self.config = config if config is not None else self.load_config(config_path)
+        for item in overrides or []:
+            keys, value = _parse_override(item)
+            section = self.config
+            for k in keys[:-1]:
+                section = section.setdefault(k, {})
+            section[keys[-1]] = value
+        self.schedule_rate = self._read_schedule_rate()
+
         log_name = self.config['logger']['name']
         file_name = self.config['logger']['file_name']
         self.logger = FanTwoLogger(log_name, file_name)  # 新增Logger
 
-        self.http_client = PicartHTTPClient(self.config, self.logger)  # 传入logger
+        self._http_client = None
         self.task_queue = Queue()
         self.lock = threading.Lock()
+        self.results: List[Dict[str, Any]] = []
+        self.temp_budget = None
+        self._info_cache: Dict[Path, Dict[str, Any]] = {}
+        self.plan: List[Dict[str, Any]] = []
+        self.autoscaler = None
+        self.submit_queue = None
+        # 发布请求仍在后台队列中的压缩包：记录 id -> (结果, 共享租约队列)，以及先于结果到达的提交结果
+        self._queued_results: Dict[int, Tuple[Dict[str, Any], Any]] = {}
+        self._submission_outcomes: Dict[int, bool] = {}
+        self._stage_local = threading.local()
+        self._running_workers = 0
+
+    @property
+    def http_client(self):
+        """HTTP 客户端，首次访问时才导入 requests 并校验 auth 配置
+
+        run/upload_only 启动时先访问一次，保证 auth 配置错误在处理开始前退出；scan/stats 不会访问。
+        """
+        if self._http_client is None:
+            with self.lock:
+                if self._http_client is None:
+                    from HttpClient import PicartHTTPClient
+                    self._http_client = PicartHTTPClient(self.config, self.logger)  # 传入logger
+        return self._http_client
+
+    def _read_schedule_rate(self) -> float:
+        """读取 [schedule] mb_per_second，返回每秒处理字节数，非正数或非数字时报错"""
+        rate = self.config.get('schedule', {}).get('mb_per_second', 4.0)
+        if isinstance(rate, bool) or not isinstance(rate, (int, float)) or rate <= 0:
+            raise ValueError(f"[schedule] mb_per_second 必须是大于 0 的数字: {rate!r}")
+        return rate * 1024 * 1024
 
     @staticmethod
     def load_config(config_path: str) -> Dict[str, Any]:
         """加载配置文件"""
+        import toml
+
         with open(config_path, 'r', encoding='utf-8') as f:
             return toml.load(f)
 
-    def scan_archives(self):
-        """扫描指定目录下的所有压缩文件"""
+    def list_archives(self) -> List[Path]:
+        """列出源目录下的所有压缩文件（不入队）"""
         source_dir = self.config.get('source', {}).get('directory', './archives')
-        archive_extensions = ['.zip', '.rar', '.7z']
 
-        for _file_path in Path(source_dir).iterdir():
-            if _file_path.suffix.lower() in archive_extensions and _file_path.is_file():
-                self.task_queue.put(_file_path)
-                self.logger.info(f"发现压缩文件: {_file_path.name}")
+        return [_file_path for _file_path in Path(source_dir).iterdir()
+                if _file_path.suffix.lower() in ARCHIVE_EXTENSIONS and _file_path.is_file()]
+
+    def schedule_policy(self) -> str:
+        """[schedule] 配置的调度策略名"""
+        return self.config.get('schedule', {}).get('policy', 'fifo').lower()
+
+    def archive_cost(self, archive_path: Path, read_header: bool = True) -> int:
+        """估算单个压缩包的处理开销
+
+        read_header 为 False 时不读取文件头（不导入 rarfile/py7zr），按压缩包大小近似估算。
+        """
+        if not read_header:
+            return archive_path.stat().st_size
+        member_cost = int(self.config.get('schedule', {}).get('member_cost_kb', 256) * 1024)
+        info = self.read_archive_info(archive_path)
+        return estimate_cost(info['size'], info['members'], member_cost)
+
+    def plan_archives(self, read_headers: Optional[bool] = None,
+                      archives: Optional[List[Path]] = None) -> List[Dict[str, Any]]:
+        """按 [schedule] 配置的策略排序压缩文件，只读取文件头估算开销
+
+        read_headers 为 None 时只有需要按开销排序的策略才读取文件头，fifo 保持扫描顺序，
+        不读取文件头；archives 为 None 时使用源目录中的全部压缩文件。
+        """
+        policy = self.schedule_policy()
+        if read_headers is None:
+            read_headers = policy != 'fifo'
+
+        jobs = []
+        for archive_path in self.list_archives() if archives is None else archives:
+            jobs.append({
+                'path': archive_path,
+                'cost': self.archive_cost(archive_path, read_headers),
+                'priority': parse_priority(archive_path.name),
+            })
+
+        try:
+            return order_jobs(jobs, policy)
+        except ValueError as e:
+            self.logger.error(f"{e}，按 fifo 处理")
+            return jobs
+
+    def predict_makespan(self, jobs: List[Dict[str, Any]], workers: int, bytes_per_second: float) -> float:
+        """按给定处理速度模拟调度，返回预计总耗时"""
+        return simulate_makespan([job['cost'] / bytes_per_second for job in jobs], workers)
+
+    def scan_archives(self):
+        """扫描指定目录下的所有压缩文件"""
+        self.plan = self.plan_archives()
+        for job in self.plan:
+            self.task_queue.put(job['path'])
+            self.logger.info(f"发现压缩文件: {job['path'].name}")
 
     @staticmethod
     def format_folder_name(name: str) -> str:
         """格式化文件夹名称，删除包含P、-和MB的[]内容，并移除所有[]符号"""
+        # 删除优先级标签
+        name = PRIORITY_PATTERN.sub('', name)
+
         # 先删除包含尺寸信息的 []
         pattern = r'\[[^\]]*P[^\]]*-[^\]]*MB[^\]]*\]'
         name = re.sub(pattern, '', name)
@@ -99,9 +302,12 @@ class ArchiveProcessor:
         # 获取密码列表，默认包含 'fantwo'
         passwords = self.config['unpack'].get('password', ['fantwo'])
 
+        # ZIP 并行解压线程数
+        zip_workers = self.config['unpack'].get('zip_workers', 1)
+
         # 支持的压缩格式映射
         archive_handlers = {
-            '.zip': _extract_zip,
+            '.zip': partial(_extract_zip, workers=zip_workers),
             '.rar': _extract_rar,
             '.7z': _extract_7z
         }
@@ -118,9 +324,11 @@ class ArchiveProcessor:
         # 尝试所有密码
         for password in passwords:
             try:
+                start_time = time.perf_counter()
                 if extract_handler(archive_path, extract_dir, password):
                     self.logger.success(
-                        f"解压成功 (密码: {password}), 格式: {file_ext}, 文件: {archive_path.name}"
+                        f"解压成功 (密码: {password}), 格式: {file_ext}, 文件: {archive_path.name}, "
+                        f"耗时: {time.perf_counter() - start_time:.2f}s"
                     )
                     return True
             except Exception as e:
@@ -171,38 +379,86 @@ class ArchiveProcessor:
             file_path.rename(new_path)
 
     def compress_images(self, folder_path: Path):
-        """压缩图片"""
+        """压缩图片
+
+        只读取文件头判断尺寸，不需要缩放且预计节省的空间低于 min_saving 时原样保留，
+        不做解码和重新编码；实际编码后节省不足 min_saving 时同样保留原图。
+        """
+        from PIL import Image
+
         img_config = self.config['compress_img']
         output_format = img_config.get('format', 'webp')
         quality = img_config.get('quality', 80)
         max_width = img_config.get('longWidth', 1280)
+        # 转码后预计节省的最小比例，默认只要不变大就转码
+        min_saving = img_config.get('min_saving', 0.0)
+        # 输出格式预计的每像素比特数，用于只读文件头就估算转码后大小，0 表示不估算
+        expected_bpp = img_config.get('expected_bpp', 0.0)
 
         image_extensions = ['.jpg', '.jpeg', '.png', '.bmp', '.gif']
 
         for file_path in folder_path.iterdir():
             if file_path.is_file() and file_path.suffix.lower() in image_extensions:
                 try:
+                    size_in = file_path.stat().st_size
+                    # Image.open 只解析文件头，直到 resize/save 时才解码像素
                     with Image.open(file_path) as img:
+                        width, height = img.size
+                        needs_resize = max_width > 0 and max(width, height) > max_width
+
+                        if not needs_resize and expected_bpp > 0 and size_in > 0:
+                            predicted = width * height * expected_bpp / 8
+                            if 1 - predicted / size_in < min_saving:
+                                self._record_image(file_path, 'skipped', size_in, size_in,
+                                                   f"{img.format} {width}x{height}, "
+                                                   f"{size_in * 8 / (width * height):.2f} bpp")
+                                continue
+
                         # 调整尺寸
-                        if max_width > 0:
-                            width, height = img.size
-                            if width > height and width > max_width:
+                        if needs_resize:
+                            if width > height:
                                 new_height = int(height * (max_width / width))
                                 img = img.resize((max_width, new_height), Image.Resampling.LANCZOS)
-                            elif height > max_width:
+                            else:
                                 new_width = int(width * (max_width / height))
                                 img = img.resize((new_width, max_width), Image.Resampling.LANCZOS)
 
-                        # 转换格式并保存
-                        output_path = file_path.with_suffix(f'.{output_format}')
-                        img.save(output_path, format=output_format.upper(), quality=quality)
+                        # 转换格式，先编码到内存，确认有收益再写入
+                        buffer = io.BytesIO()
+                        img.save(buffer, format=output_format.upper(), quality=quality)
+
+                    size_out = buffer.tell()
+                    if not needs_resize and size_out > size_in * (1 - min_saving):
+                        self._record_image(file_path, 'skipped', size_in, size_in,
+                                           f"转码后 {size_out / 1024:.0f} KB，原图 {size_in / 1024:.0f} KB")
+                        continue
 
-                        # 删除原文件
+                    output_path = file_path.with_suffix(f'.{output_format}')
+                    output_path.write_bytes(buffer.getbuffer())
+
+                    # 删除原文件
+                    if output_path != file_path:
                         file_path.unlink()
 
+                    self._record_image(file_path, 'success', size_in, size_out)
+
                 except Exception as e:
+                    IMAGES_TRANSCODED.labels('failed').inc()
                     self.logger.error(f"图片压缩失败 {file_path.name}: {e}")
 
+    def _record_image(self, file_path: Path, result: str, size_in: int, size_out: int, reason: str = ''):
+        """记录单张图片的转码结果，计入指标和当前压缩包的统计"""
+        IMAGES_TRANSCODED.labels(result).inc()
+        STAGE_BYTES.labels('compress_images', 'in').inc(size_in)
+        STAGE_BYTES.labels('compress_images', 'out').inc(size_out)
+        if result == 'skipped':
+            self.logger.debug(f"图片原样保留 {file_path.name}: {reason}")
+
+        images = getattr(self._stage_local, 'images', None)
+        if images is not None:
+            images[result] = images.get(result, 0) + 1
+            images['saved'] = images.get('saved', 0) + size_in - size_out
+
     # def create_archive(self, folder_path: Path, output_path: Path):
     #     """创建压缩包"""
     #     compress_config = self.config['compress_file']
@@ -252,6 +508,8 @@ class ArchiveProcessor:
         compression_level = config.get('compression_level', 5)
         method = config.get('method', 'lzma2')
 
+        import py7zr
+
         filters = self._get_7z_filters(method, compression_level)
 
         archive_args = {
@@ -341,6 +599,8 @@ class ArchiveProcessor:
     @staticmethod
     def _get_7z_filters(method: str, level: int) -> list:
         """获取7z压缩过滤器配置"""
+        import py7zr
+
         method_map = {
             'lzma2': {'id': py7zr.FILTER_LZMA2, 'preset': level},
             'lzma': {'id': py7zr.FILTER_LZMA, 'preset': level},
@@ -398,8 +658,28 @@ class ArchiveProcessor:
     #         self.logger.error(f"提交发布失败: {e}")
     #         return False
 
-    def process_archive(self, archive_path: Path):
-        """处理单个压缩文件"""
+    def publish_folder(self, folder_path: Path, title: str,
+                       source: Optional[str] = None) -> Tuple[bool, bool, Optional[Dict]]:
+        """上传文件夹中的图片并提交发布请求，返回 (是否提交, 是否成功, 响应数据)
+
+        启用发布队列时只把请求写入队列，返回 (True, None, None)，是否成功要等后台提交完成后才知道。
+        """
+        worker_num = self.config.get('worker', {}).get('upload', 1)
+        uploaded_files = self.http_client.upload_files(folder_path, worker_num)
+        image_urls = [f.get('url', '') for f in uploaded_files if f.get('url')]
+
+        if not image_urls:
+            return False, False, None
+
+        post_data = self.create_post_request(title, image_urls)
+        if self.submit_queue is not None:
+            self._stage_local.submission = self.submit_queue.enqueue(source or folder_path.name, post_data)
+            return True, None, None
+        success, res_data = self.http_client.submit_post(post_data)
+        return True, success, res_data
+
+    def process_archive(self, archive_path: Path) -> Optional[bool]:
+        """处理单个压缩文件，返回是否处理成功；发布请求已加入后台队列、尚未提交时返回 None"""
         try:
             # 创建临时工作目录
             temp_dir = Path('./temp') / archive_path.stem
@@ -416,9 +696,13 @@ class ArchiveProcessor:
             self.logger.info(f"目标目录: {temp_dir}")
 
             # 解压
-            if not self.extract_archive(archive_path, temp_dir):
-                self.logger.error(f"解压失败: {archive_path.name}")
-                return
+            with self._stage('extract'):
+                if not self.extract_archive(archive_path, temp_dir):
+                    self.logger.error(f"解压失败: {archive_path.name}")
+                    return False
+
+            STAGE_BYTES.labels('extract', 'in').inc(archive_path.stat().st_size)
+            STAGE_BYTES.labels('extract', 'out').inc(_folder_size(temp_dir))
 
             # 详细检查解压结果
             self.logger.debug("解压后目录内容:")
@@ -443,7 +727,7 @@ class ArchiveProcessor:
                     self.logger.info(f"使用根目录作为内容文件夹: {content_folder}")
                 else:
                     self.logger.info("既没有文件夹也没有图片文件，跳过处理")
-                    return
+                    return True
             else:
                 # 正常情况：有文件夹
                 content_folder = extracted_folders[0]
@@ -455,44 +739,79 @@ class ArchiveProcessor:
             content_folder.rename(processed_folder)
             # content_folder.rename(temp_dir)
 
-            # 清理文件
-            self.clean_files(processed_folder)
+            with self._stage('clean'):
+                # 清理文件
+                self.clean_files(processed_folder)
 
-            # 重命名文件
-            self.rename_files(processed_folder)
+                # 重命名文件
+                self.rename_files(processed_folder)
 
             # 压缩图片
-            self.compress_images(processed_folder)
+            with self._stage('compress_images'):
+                self.compress_images(processed_folder)
 
             # 创建压缩包
             output_archive = Path('./output') / f"{formatted_name}.7z"
             output_archive.parent.mkdir(exist_ok=True)
-            self.create_archive(processed_folder, output_archive)
-
-            # 上传图片
-            worker_num = self.config.get('worker', {}).get('upload', 1)
-            uploaded_files = self.http_client.upload_files(processed_folder, worker_num)
-            image_urls = [f.get('url', '') for f in uploaded_files if f.get('url')]
-
-            # 创建并提交发布请求
-            if image_urls:
-                post_data = self.create_post_request(formatted_name, image_urls)
-                success, res_data = self.http_client.submit_post(post_data)
-                if success:
+            with self._stage('create_archive'):
+                if self.create_archive(processed_folder, output_archive):
+                    STAGE_BYTES.labels('create_archive', 'in').inc(_folder_size(processed_folder))
+                    STAGE_BYTES.labels('create_archive', 'out').inc(output_archive.stat().st_size)
+
+            # 上传图片并提交发布请求
+            with self._stage('upload'):
+                posted, success, res_data = self.publish_folder(processed_folder, formatted_name,
+                                                                archive_path.name)
+            if posted:
+                if success is None:
+                    self.logger.info(f"发布请求已加入后台队列: {archive_path.name}")
+                elif success:
                     self.logger.success(f"处理完成: {archive_path.name}")
                     self.logger.success(res_data)
                 else:
                     self.logger.error(f"发布提交失败: {archive_path.name}")
+            else:
+                self.logger.error(f"没有上传成功的图片: {archive_path.name}")
 
-            # 清理临时文件
-            shutil.rmtree(temp_dir)
+            # 清理临时文件，启用临时空间预算时需要同步删除，保证预算释放时空间已经腾出
+            if self.submit_queue is not None and self.temp_budget is None:
+                self.submit_queue.defer_cleanup(temp_dir)
+            else:
+                shutil.rmtree(temp_dir)
+            return posted and success
 
         except Exception as e:
             self.logger.error(f"处理失败 {archive_path.name}: {e}")
+            return False
+
+    @contextmanager
+    def _stage(self, name: str):
+        """记录处理阶段耗时，供自动扩缩容和指标使用"""
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start_time
+            STAGE_DURATION.labels(name).observe(elapsed)
+            stages = getattr(self._stage_local, 'stages', None)
+            if stages is not None:
+                stages[name] = stages.get(name, 0.0) + elapsed
+
+    def _should_retire(self) -> bool:
+        """自动扩缩容缩减 worker 时，多余的线程在处理完当前压缩包后退出"""
+        if self.autoscaler is None:
+            return False
+        with self.lock:
+            if self._running_workers > self.autoscaler.target:
+                self._running_workers -= 1
+                return True
+        return False
 
     def worker(self):
         """工作线程函数"""
         while True:
+            if self._should_retire():
+                break
             try:
                 archive_path = self.task_queue.get_nowait()
             except queue.Empty:
@@ -504,20 +823,542 @@ class ArchiveProcessor:
                 break
 
             self.logger.info(f"开始处理: {archive_path.name}")
-            self.process_archive(archive_path)
+            self._record_result(self.process_with_admission(archive_path))
             self.task_queue.task_done()
 
+    def process_archive_with_stats(self, archive_path: Path) -> Dict[str, Any]:
+        """处理单个压缩文件并返回结果统计（可跨进程传递）"""
+        size = archive_path.stat().st_size if archive_path.exists() else 0
+        start_time = time.perf_counter()
+        self._stage_local.stages = {}
+        self._stage_local.images = {}
+        self._stage_local.submission = None
+        ARCHIVES_IN_PROGRESS.inc()
+        try:
+            success = self.process_archive(archive_path)
+        finally:
+            ARCHIVES_IN_PROGRESS.dec()
+            stages, self._stage_local.stages = self._stage_local.stages, None
+            images, self._stage_local.images = self._stage_local.images, None
+            submission, self._stage_local.submission = self._stage_local.submission, None
+        elapsed = time.perf_counter() - start_time
+        # 等待后台发布的压缩包在提交有结果后再计数，排队中的数量见 submit_pending 队列深度
+        if success is not None:
+            ARCHIVES_PROCESSED.labels('success' if success else 'failed').inc()
+        ARCHIVE_DURATION.observe(elapsed)
+        return {
+            'archive': archive_path.name,
+            'success': success,
+            'size': size,
+            'elapsed': elapsed,
+            'finished': time.time(),
+            'pid': os.getpid(),
+            'stages': stages,
+            'images': images,
+            # 发布请求在后台队列中的记录 id，success 为 None 时有效
+            'submission': submission if success is None else None,
+        }
+
+    def read_archive_info(self, archive_path: Path) -> Dict[str, Any]:
+        """只读取文件头获取压缩包声明的解压后大小和文件数，读取失败时以压缩包大小估算"""
+        cached = self._info_cache.get(archive_path)
+        if cached is not None:
+            return cached
+
+        compressed = archive_path.stat().st_size
+        info = {'size': compressed, 'members': 0, 'compressed': compressed, 'declared': False}
+        reader = ARCHIVE_INFO_READERS.get(archive_path.suffix.lower())
+        if reader is not None:
+            # 头部加密的 RAR/7Z 需要密码，依次尝试
+            for password in self.config['unpack'].get('password', ['fantwo']):
+                try:
+                    size, members = reader(archive_path, password)
+                    info.update(size=size, members=members, declared=True)
+                    break
+                except Exception as e:
+                    self.logger.debug(f"读取压缩包信息失败 (密码: {password}): {e}, 文件: {archive_path.name}")
+            else:
+                self.logger.warning(f"无法读取压缩包声明大小，按压缩包大小估算: {archive_path.name}")
+
+        with self.lock:
+            self._info_cache[archive_path] = info
+        return info
+
+    def create_temp_budget(self):
+        """根据 [admission] 配置创建临时空间预算，未配置时返回 None"""
+        admission_config = self.config.get('admission', {})
+        budget_mb = admission_config.get('temp_budget_mb', 0)
+        min_free_mb = admission_config.get('min_free_mb', 0)
+        if not budget_mb and not min_free_mb:
+            return None
+
+        from TempBudget import TempDiskBudget
+
+        return TempDiskBudget(Path('./temp'), self.logger,
+                              budget_bytes=int(budget_mb * 1024 * 1024),
+                              min_free_bytes=int(min_free_mb * 1024 * 1024))
+
+    def estimate_temp_size(self, archive_path: Path) -> int:
+        """估算处理该压缩包时临时目录的峰值占用"""
+        factor = self.config.get('admission', {}).get('size_factor', 1.2)
+        return int(self.read_archive_info(archive_path)['size'] * factor)
+
+    def process_with_admission(self, archive_path: Path) -> Dict[str, Any]:
+        """在临时空间预算内处理压缩包，未启用预算时直接处理"""
+        if self.temp_budget is None:
+            return self.process_archive_with_stats(archive_path)
+
+        with self.temp_budget.reserve(archive_path.name, self.estimate_temp_size(archive_path)):
+            return self.process_archive_with_stats(archive_path)
+
+    def _record_result(self, result: Dict[str, Any], work_queue=None):
+        """记录单个压缩包的处理结果并结束租约；发布请求仍在后台队列中的压缩包等提交完成后再结束租约"""
+        with self.lock:
+            self.results.append(result)
+        if self.autoscaler is not None and result.get('stages'):
+            self.autoscaler.record_stages(result['stages'])
+
+        if result['success'] is None:
+            submission = result.get('submission')
+            with self.lock:
+                outcome = self._submission_outcomes.pop(submission, None)
+                if outcome is None:
+                    self._queued_results[submission] = (result, work_queue)
+                    return
+            self._resolve_queued(result, work_queue, outcome)
+        elif work_queue is not None:
+            work_queue.complete(result['archive'], result['success'])
+
+    def _on_submission_finished(self, submission: int, archive: str, success: bool):
+        """后台发布队列中的请求有最终结果时，更新对应压缩包的结果并结束租约"""
+        with self.lock:
+            entry = self._queued_results.pop(submission, None)
+            if entry is None:
+                # worker 进程的结果还没回传，或者是上次运行遗留的请求
+                self._submission_outcomes[submission] = success
+                return
+        self._resolve_queued(*entry, success)
+
+    @staticmethod
+    def _resolve_queued(result: Dict[str, Any], work_queue, success: bool):
+        """把等待发布的压缩包结果更新为最终结果"""
+        result['success'] = success
+        ARCHIVES_PROCESSED.labels('success' if success else 'failed').inc()
+        if work_queue is not None:
+            work_queue.complete(result['archive'], success)
+
+    def work_queue_path(self) -> str:
+        """共享租约队列数据库路径，未配置时放在源目录下"""
+        source_dir = self.config.get('source', {}).get('directory', './archives')
+        return self.config.get('distribute', {}).get('database') or str(Path(source_dir) / '.work_queue.sqlite')
+
+    def create_work_queue(self):
+        """根据 [distribute] 配置创建共享租约队列，未启用时返回 None"""
+        dist_config = self.config.get('distribute', {})
+        if not dist_config.get('enabled', False):
+            return None
+
+        from WorkQueue import LeaseWorkQueue
+
+        return LeaseWorkQueue(
+            self.work_queue_path(),
+            self.logger,
+            lease_seconds=dist_config.get('lease_seconds', 300),
+            heartbeat_seconds=dist_config.get('heartbeat_seconds', 60),
+            max_attempts=dist_config.get('max_attempts', 3),
+            worker_id=dist_config.get('worker_id') or None
+        )
+
+    def create_submit_queue(self, owner: Optional[str] = None):
+        """根据 [submit] 配置创建后台发布队列，未启用时返回 None；owner 为空时使用本进程的标识"""
+        submit_config = self.config.get('submit', {})
+        if not submit_config.get('enabled', False):
+            return None
+
+        from SubmitQueue import PostSubmitQueue
+
+        return PostSubmitQueue(
+            submit_config.get('database', './submit_queue.sqlite'),
+            self.logger,
+            submit=lambda post_data: self.http_client.submit_post(post_data),
+            on_finished=self._on_submission_finished,
+            workers=submit_config.get('workers', 2),
+            max_attempts=submit_config.get('max_attempts', 3),
+            retry_seconds=submit_config.get('retry_seconds', 5),
+            owner=owner
+        )
+
+    def start_submit_queue(self):
+        """创建并启动后台发布队列，接手上次运行未提交的请求"""
+        self.submit_queue = self.create_submit_queue()
+        if self.submit_queue is None:
+            return
+        counts = self.submit_queue.status_counts()
+        self.logger.info(f"发布队列: {self.submit_queue.db_path}, 当前状态: {counts}")
+        self.submit_queue.start()
+        QUEUE_DEPTH.labels('submit_pending').set_function(self.submit_queue.pending_count)
+
+    def finish_submit_queue(self):
+        """等待后台发布队列提交完毕并汇报结果"""
+        if self.submit_queue is None:
+            return
+        pending = self.submit_queue.pending_count()
+        if pending:
+            self.logger.info(f"等待发布队列提交剩余 {pending} 个请求...")
+        self.submit_queue.close()
+
+        outcomes = self.submit_queue.outcomes()
+        succeeded = sum(1 for o in outcomes if o['success'])
+        self.logger.info(
+            f"发布统计: 成功 {succeeded}/{len(outcomes)}, 失败 {len(outcomes) - succeeded}, "
+            f"队列状态: {self.submit_queue.status_counts()}"
+        )
+        for outcome in outcomes:
+            if not outcome['success']:
+                self.logger.error(f"发布失败 ({outcome['attempts']} 次): {outcome['archive']}, {outcome['error']}")
+
+        # 回调没有覆盖到的请求（如回调出错）按数据库中的最终状态结束，不留下未释放的租约
+        with self.lock:
+            leftover, self._queued_results = self._queued_results, {}
+        statuses = self.submit_queue.statuses(list(leftover))
+        unresolved = []
+        for submission, (result, work_queue) in leftover.items():
+            status = statuses.get(submission)
+            if status in (self.submit_queue.STATUS_DONE, self.submit_queue.STATUS_FAILED):
+                self._resolve_queued(result, work_queue, status == self.submit_queue.STATUS_DONE)
+                continue
+            unresolved.append(result['archive'])
+            # 请求会在下次运行时继续提交，租约标记为失败，避免其他 worker 重新处理后重复发布
+            if work_queue is not None:
+                work_queue.complete(result['archive'], False)
+        if unresolved:
+            self.logger.warning(f"{len(unresolved)} 个压缩包的发布请求仍未提交，保留在队列中: {', '.join(unresolved)}")
+
+    def _claim_next(self, work_queue) -> Optional[Path]:
+        """从共享租约队列领取下一个存在的压缩包，队列已空时返回 None"""
+        source_dir = Path(self.config.get('source', {}).get('directory', './archives'))
+        while True:
+            name = work_queue.claim()
+            if name is None:
+                return None
+
+            archive_path = source_dir / name
+            if archive_path.is_file():
+                return archive_path
+            self.logger.error(f"压缩文件不存在: {archive_path}")
+            work_queue.complete(name, False)
+
+    def lease_worker(self, work_queue):
+        """分布式工作线程函数，从共享租约队列领取任务"""
+        while True:
+            if self._should_retire():
+                break
+            archive_path = self._claim_next(work_queue)
+            if archive_path is None:
+                break
+
+            self.logger.info(f"开始处理: {archive_path.name} (worker: {work_queue.worker_id})")
+            self._record_result(self.process_with_admission(archive_path), work_queue)
+
     def run(self):
         """启动处理流程"""
         self.logger.separator("=", 60)
+        # 在处理任何压缩包之前校验 auth 配置，配置不完整时直接退出
+        _ = self.http_client
         self.logger.info("开始扫描压缩文件...")
-        self.scan_archives()
-        max_workers = self.config.get('worker', {}).get('unpack', 1)
-        total_files = self.task_queue.qsize()
-        self.logger.info(f"开始处理 {total_files} 个文件，使用 {max_workers} 个线程...")
+        worker_config = self.config.get('worker', {})
+        max_workers = worker_config.get('unpack', 1)
+        mode = worker_config.get('mode', 'thread').lower()
+        unit = "个进程" if mode == 'process' else "个线程"
+        self.temp_budget = self.create_temp_budget()
+        self.start_metrics_server()
+        QUEUE_DEPTH.labels('tasks').set_function(self.task_queue.qsize)
+
+        work_queue = self.create_work_queue()
+        if work_queue is not None:
+            # 只为待处理和新发现的压缩包读取文件头排序，已完成或被其他 worker 持有的不再读取
+            archives = self.list_archives()
+            unfinished = work_queue.unfinished([path.name for path in archives])
+            archives = [path for path in archives if path.name in unfinished]
+            added = work_queue.register([job['path'].name for job in self.plan_archives(archives=archives)])
+            counts = work_queue.status_counts()
+            self.logger.info(
+                f"共享队列: {work_queue.db_path}, 本次新登记 {added} 个, 当前状态: {counts}"
+            )
+            self.logger.info(f"开始领取任务，worker: {work_queue.worker_id}，使用 {max_workers} {unit}...")
+            work_queue.start_heartbeat()
+            QUEUE_DEPTH.labels('lease_pending').set_function(
+                lambda: work_queue.status_counts().get(work_queue.STATUS_PENDING, 0))
+        else:
+            self.scan_archives()
+            total_files = self.task_queue.qsize()
+            self.logger.info(f"开始处理 {total_files} 个文件，使用 {max_workers} {unit}...")
+
+        self.autoscaler = self.create_autoscaler(max_workers, work_queue, process_mode=mode == 'process')
+        start_time = time.perf_counter()
+        start_wall = time.time()
+        self.start_submit_queue()
+        try:
+            if self.autoscaler is not None:
+                self.autoscaler.start()
+            if mode == 'process':
+                self._run_processes(max_workers, work_queue)
+            elif work_queue is not None:
+                self._run_threads(max_workers, self.lease_worker, (work_queue,))
+            else:
+                self._run_threads(max_workers, self.worker, ())
+            # 等待发布队列提交完毕，等待期间租约继续续约，提交结果确定后才结束租约
+            self.finish_submit_queue()
+        finally:
+            if self.autoscaler is not None:
+                self.autoscaler.stop()
+            if work_queue is not None:
+                work_queue.stop_heartbeat()
+
+        elapsed = time.perf_counter() - start_time
+        self.log_summary(mode, elapsed)
+        if work_queue is None:
+            self.log_schedule_report(max_workers, elapsed, start_wall)
+        self.logger.success("所有任务处理完成")
+        self.logger.separator("=", 60)
+
+    def _run_threads_autoscaled(self, target, target_args: tuple):
+        """自动扩缩容模式：按控制器的目标数补充线程，多余线程由 _should_retire 自行退出"""
+        threads: List[threading.Thread] = []
+
+        def run_worker():
+            try:
+                target(*target_args)
+            except Exception as e:
+                self.logger.error(f"线程执行错误: {e}")
+
+        while True:
+            alive = [t for t in threads if t.is_alive()]
+            with self.lock:
+                # 线程正常结束（队列已空）时同步计数
+                self._running_workers = min(self._running_workers, len(alive))
+                missing = self.autoscaler.target - self._running_workers
+                if missing > 0 and self.autoscaler.backlog() > 0:
+                    self._running_workers += missing
+                else:
+                    missing = 0
+            for _ in range(missing):
+                thread = threading.Thread(target=run_worker, daemon=True)
+                thread.start()
+                alive.append(thread)
+            threads = alive
+
+            if not threads:
+                break
+            threads[0].join(timeout=1)
+
+    def log_schedule_report(self, workers: int, elapsed: float, start_wall: float):
+        """对比调度的预计总耗时和实际总耗时"""
+        if not self.plan or not self.results:
+            return
+        policy = self.schedule_policy()
+        # 只按实际处理过的压缩包模拟，开销在运行结束后读取文件头估算（fifo 运行时不读取）
+        processed = {r['archive'] for r in self.results}
+        jobs = [dict(job, cost=self.archive_cost(job['path']))
+                for job in self.plan if job['path'].name in processed and job['path'].is_file()]
+        predicted = self.predict_makespan(jobs, workers, self.schedule_rate)
+
+        # 用本次实际的平均处理速度重新模拟，便于校准 mb_per_second
+        costs = {job['path'].name: job['cost'] for job in jobs}
+        total_cost = sum(costs.get(r['archive'], 0) for r in self.results)
+        total_elapsed = sum(r['elapsed'] for r in self.results)
+        latencies = [r['finished'] - start_wall for r in self.results]
+        message = (f"调度报告 ({policy}): 预计总耗时 {predicted:.1f}s, 实际总耗时 {elapsed:.1f}s, "
+                   f"平均完成时间 {sum(latencies) / len(latencies):.1f}s")
+        if total_cost and total_elapsed:
+            observed_rate = total_cost / total_elapsed
+            calibrated = self.predict_makespan(jobs, workers, observed_rate)
+            message += (f", 按实际速度 {observed_rate / 1024 / 1024:.2f} MB/s 校准后预计 {calibrated:.1f}s")
+        self.logger.info(message)
+
+    def start_metrics_server(self):
+        """根据 [metrics] 配置启动 Prometheus 文本格式的 /metrics 端点"""
+        metrics_config = self.config.get('metrics', {})
+        if not metrics_config.get('enabled', False):
+            return
+
+        from Metrics import start_http_server
+
+        host = metrics_config.get('host', '127.0.0.1')
+        port = metrics_config.get('port', 9108)
+        try:
+            start_http_server(port, host)
+            self.logger.info(f"指标端点已启动: http://{host}:{port}/metrics")
+        except OSError as e:
+            self.logger.error(f"指标端点启动失败 {host}:{port}: {e}")
+
+    @contextmanager
+    def _aggregated_logs(self):
+        """进程模式下由主进程汇总 worker 进程的日志，产出传给 worker 进程的日志队列，未启用时为 None"""
+        if not self.config['logger'].get('aggregate', True):
+            yield None
+            return
+
+        aggregator = LogAggregator()
+        aggregator.start()
+        try:
+            yield aggregator.queue
+        finally:
+            aggregator.stop()
+
+    def _run_processes(self, max_workers: int, work_queue=None):
+        """进程模式：每个压缩包在独立的 worker 进程中完整处理，结果回传给父进程"""
+        from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+        from concurrent.futures.process import BrokenProcessPool
+
+        def next_task() -> Optional[Path]:
+            if work_queue is not None:
+                return self._claim_next(work_queue)
+            try:
+                return self.task_queue.get_nowait()
+            except queue.Empty:
+                return None
+
+        # 自动扩缩容时进程池按上限创建，通过在途任务数控制实际并发
+        pool_size = self.autoscaler.max_workers if self.autoscaler is not None else max_workers
+
+        def limit() -> int:
+            return self.autoscaler.target if self.autoscaler is not None else max_workers
+
+        with self._aggregated_logs() as log_queue, \
+                ProcessPoolExecutor(max_workers=pool_size, initializer=_init_process_worker,
+                                    initargs=(self.config, log_queue, self.submit_queue.owner
+                                              if self.submit_queue is not None else None)) as executor:
+            pending = {}
+            exhausted = False
+            # 子进程中的 in_progress 不回传，由父进程按在途任务数采集
+            ARCHIVES_IN_PROGRESS.set_function(lambda: len(pending))
+            # 因临时空间不足暂缓提交的任务，等有任务完成后再尝试
+            deferred = None
+            while True:
+                # 保持进程池满载，按需领取任务，避免一次性占用所有租约
+                while not exhausted and len(pending) < limit():
+                    # 暂缓的任务每次等待超时都会重试，只在第一次暂缓时输出日志
+                    retrying = deferred is not None
+                    archive_path = deferred or next_task()
+                    deferred = None
+                    if archive_path is None:
+                        exhausted = True
+                        break
+                    if self.temp_budget is not None and not self.temp_budget.try_acquire(
+                            archive_path.name, self.estimate_temp_size(archive_path)):
+                        if not retrying:
+                            self.logger.info(f"临时空间不足，等待其他任务完成: {archive_path.name}")
+                        deferred = archive_path
+                        break
+                    self.logger.info(f"开始处理: {archive_path.name}")
+                    try:
+                        pending[executor.submit(_run_process_task, archive_path)] = archive_path
+                    except BrokenProcessPool:
+                        self.logger.critical("进程池已损坏，停止提交新任务")
+                        if self.temp_budget is not None:
+                            self.temp_budget.release(archive_path.name)
+                        if work_queue is not None:
+                            work_queue.release(archive_path.name)
+                        exhausted = True
+
+                if not pending:
+                    break
+
+                # 带超时等待，扩容后可以及时补充任务
+                done, _ = wait(pending, timeout=1, return_when=FIRST_COMPLETED)
+                for future in done:
+                    archive_path = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        self.logger.error(f"进程执行错误 {archive_path.name}: {e}")
+                        result = {'archive': archive_path.name, 'success': False, 'size': 0,
+                                  'elapsed': 0.0, 'finished': time.time(), 'pid': None}
+                        ARCHIVES_PROCESSED.labels('failed').inc()
+                        if isinstance(e, BrokenProcessPool):
+                            exhausted = True
+                    REGISTRY.merge(result.pop('metrics', {}))
+                    self._record_result(result, work_queue)
+                    if self.temp_budget is not None:
+                        self.temp_budget.release(archive_path.name)
+
+            # 进程池异常退出时，把暂缓的任务退回共享队列
+            if deferred is not None and work_queue is not None:
+                work_queue.release(deferred.name)
+
+    def log_summary(self, mode: str, elapsed: float):
+        """输出本次运行的处理统计"""
+        total = len(self.results)
+        succeeded = sum(1 for r in self.results if r['success'])
+        # 发布请求仍在后台队列中、尚未提交的压缩包
+        unpublished = sum(1 for r in self.results if r['success'] is None)
+        total_mb = sum(r['size'] for r in self.results) / 1024 / 1024
+        busy = sum(r['elapsed'] for r in self.results)
+        throughput = total_mb / elapsed if elapsed > 0 else 0.0
+        self.logger.info(
+            f"处理统计 ({mode}): 成功 {succeeded}/{total}, 失败 {total - succeeded - unpublished}, "
+            f"{f'未发布 {unpublished}, ' if unpublished else ''}"
+            f"数据量 {total_mb:.1f} MB, 总耗时 {elapsed:.1f}s, 累计处理耗时 {busy:.1f}s, 吞吐 {throughput:.2f} MB/s"
+        )
+
+        images: Dict[str, int] = {}
+        for r in self.results:
+            for key, value in (r.get('images') or {}).items():
+                images[key] = images.get(key, 0) + value
+        if images:
+            self.logger.info(
+                f"图片统计: 转码 {images.get('success', 0)}, 原样保留 {images.get('skipped', 0)}, "
+                f"节省 {images.get('saved', 0) / 1024 / 1024:.1f} MB"
+            )
+
+        for pid in sorted({r['pid'] for r in self.results if r['pid'] is not None}):
+            count = sum(1 for r in self.results if r['pid'] == pid)
+            self.logger.debug(f"进程 {pid}: 处理 {count} 个压缩包")
+
+    def create_autoscaler(self, max_workers: int, work_queue=None, process_mode: bool = False):
+        """根据 [autoscale] 配置创建 worker 自动扩缩容控制器，未启用时返回 None"""
+        autoscale_config = self.config.get('autoscale', {})
+        if not autoscale_config.get('enabled', False):
+            return None
+
+        from AutoScaler import WorkerAutoScaler
+
+        if work_queue is not None:
+            def backlog() -> int:
+                return work_queue.status_counts().get(work_queue.STATUS_PENDING, 0)
+        else:
+            backlog = self.task_queue.qsize
+
+        temp_budget = self.temp_budget
+        autoscaler = WorkerAutoScaler(
+            self.logger,
+            min_workers=autoscale_config.get('min', 1),
+            max_workers=autoscale_config.get('max', max(max_workers, os.cpu_count() or 1)),
+            initial=max_workers,
+            backlog=backlog,
+            interval=autoscale_config.get('interval', 10),
+            cpu_high=autoscale_config.get('cpu_high', 90),
+            cpu_low=autoscale_config.get('cpu_low', 60),
+            load_high=autoscale_config.get('load_high', 1.5),
+            io_share_high=autoscale_config.get('io_share_high', 0.5),
+            admission_waiting=(lambda: temp_budget.waiting_count) if temp_budget is not None else None,
+            process_mode=process_mode
+        )
+        self.logger.info(
+            f"自动扩缩容已启用: {autoscaler.min_workers}-{autoscaler.max_workers} 个 worker，"
+            f"初始 {autoscaler.target}，每 {autoscaler.interval}s 决策一次"
+        )
+        return autoscaler
+
+    def _run_threads(self, max_workers: int, target, target_args: tuple):
+        """启动工作线程并等待全部结束"""
+        if self.autoscaler is not None:
+            self._run_threads_autoscaled(target, target_args)
+            return
 
         with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = [executor.submit(self.worker) for _ in range(max_workers)]
+            futures = [executor.submit(target, *target_args) for _ in range(max_workers)]
 
             for future in as_completed(futures):
                 try:
@@ -525,10 +1366,168 @@ class ArchiveProcessor:
                 except Exception as e:
                     self.logger.error(f"线程执行错误: {e}")
 
-        self.logger.success("所有任务处理完成")
+    def dry_run(self, read_sizes: bool = False):
+        """只扫描并列出将要处理的压缩文件，不解压、不上传
+
+        read_sizes 为 True 时读取文件头中声明的解压后大小并预测总耗时，RAR/7Z 需要导入 rarfile/py7zr。
+        """
+        self.logger.separator("=", 60)
+        jobs = self.plan_archives(read_headers=read_sizes)
+        for job in jobs:
+            archive_path = job['path']
+            formatted_name = self.format_folder_name(archive_path.stem)
+            if not read_sizes:
+                size_mb = archive_path.stat().st_size / 1024 / 1024
+                self.logger.info(f"{archive_path.name} ({size_mb:.1f} MB) -> {formatted_name}")
+                continue
+            info = self.read_archive_info(archive_path)
+            size_mb = info['compressed'] / 1024 / 1024
+            unpacked_mb = info['size'] / 1024 / 1024
+            self.logger.info(
+                f"{archive_path.name} ({size_mb:.1f} MB, 解压后 {unpacked_mb:.1f} MB, {info['members']} 个文件)"
+                f" -> {formatted_name}"
+            )
+        self.logger.info(f"共发现 {len(jobs)} 个压缩文件")
+        if not read_sizes:
+            self.logger.info("使用 scan --sizes 读取解压后大小并预测总耗时")
+            self.logger.separator("=", 60)
+            return
+        schedule_config = self.config.get('schedule', {})
+        workers = self.config.get('worker', {}).get('unpack', 1)
+        self.logger.info(
+            f"调度策略: {schedule_config.get('policy', 'fifo')}, {workers} 个 worker, "
+            f"预计总耗时 {self.predict_makespan(jobs, workers, self.schedule_rate):.1f}s"
+        )
+        self.logger.separator("=", 60)
+
+    def upload_only(self, folders: List[Path]):
+        """跳过解压/清理/压缩，直接上传已处理好的文件夹并提交发布"""
         self.logger.separator("=", 60)
+        # 在上传之前校验 auth 配置，配置不完整时直接退出
+        _ = self.http_client
+        self.start_submit_queue()
+        for folder_path in folders:
+            if not folder_path.is_dir():
+                self.logger.error(f"文件夹不存在: {folder_path}")
+                continue
+            title = self.format_folder_name(folder_path.name)
+            self.logger.info(f"开始上传: {folder_path.name}")
+            posted, success, res_data = self.publish_folder(folder_path, title)
+            if not posted:
+                self.logger.warning(f"没有上传成功的图片，跳过发布: {folder_path.name}")
+            elif self.submit_queue is not None:
+                self.logger.info(f"发布请求已加入后台队列: {folder_path.name}")
+            elif success:
+                self.logger.success(f"发布完成: {folder_path.name}")
+                self.logger.success(res_data)
+            else:
+                self.logger.error(f"发布提交失败: {folder_path.name}")
+        self.finish_submit_queue()
+        self.logger.separator("=", 60)
+
+    def print_stats(self):
+        """统计源目录与输出目录中的文件数量和大小"""
+        self.logger.separator("=", 60)
+        by_format: Dict[str, List[int]] = {}
+        for archive_path in self.list_archives():
+            entry = by_format.setdefault(archive_path.suffix.lower(), [0, 0])
+            entry[0] += 1
+            entry[1] += archive_path.stat().st_size
+
+        for ext, (count, size) in sorted(by_format.items()):
+            self.logger.info(f"源文件 {ext}: {count} 个, {size / 1024 / 1024:.1f} MB")
+        total_count = sum(v[0] for v in by_format.values())
+        total_size = sum(v[1] for v in by_format.values())
+        self.logger.info(f"源文件合计: {total_count} 个, {total_size / 1024 / 1024:.1f} MB")
+
+        output_dir = Path('./output')
+        if output_dir.is_dir():
+            outputs = [f for f in output_dir.iterdir() if f.is_file()]
+            output_size = sum(f.stat().st_size for f in outputs)
+            self.logger.info(f"输出目录: {len(outputs)} 个, {output_size / 1024 / 1024:.1f} MB")
+
+        if self.config.get('distribute', {}).get('enabled', False):
+            from WorkQueue import LeaseWorkQueue
+
+            # 只读打开，统计不会在源目录下创建数据库文件
+            db_path = self.work_queue_path()
+            counts = LeaseWorkQueue.read_status_counts(db_path)
+            self.logger.info(f"共享队列 {db_path}: {'尚未创建' if counts is None else counts}")
+        submit_config = self.config.get('submit', {})
+        if submit_config.get('enabled', False):
+            from SubmitQueue import PostSubmitQueue
+
+            db_path = submit_config.get('database', './submit_queue.sqlite')
+            counts = PostSubmitQueue.read_status_counts(db_path)
+            self.logger.info(f"发布队列 {db_path}: {'尚未创建' if counts is None else counts}")
+        self.logger.separator("=", 60)
+
+
+# 进程模式下每个 worker 进程各自持有的处理器实例（独立的 HTTP 会话和日志句柄）
+_process_processor: Optional[ArchiveProcessor] = None
+
+
+def _init_process_worker(config: Dict[str, Any], log_queue=None, submit_owner: Optional[str] = None):
+    """进程池初始化函数，在 worker 进程中创建独立的处理器"""
+    global _process_processor
+    if log_queue is not None:
+        set_log_queue(log_queue)
+    _process_processor = ArchiveProcessor(config=config)
+    # worker 进程只以主进程的 owner 写入发布队列，由主进程负责提交
+    _process_processor.submit_queue = _process_processor.create_submit_queue(owner=submit_owner)
+
+
+def _run_process_task(archive_path: Path) -> Dict[str, Any]:
+    """在 worker 进程中处理单个压缩包，返回结果统计和本进程的指标增量"""
+    result = _process_processor.process_archive_with_stats(archive_path)
+    result['metrics'] = REGISTRY.drain()
+    return result
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    """构建命令行参数解析器"""
+    parser = argparse.ArgumentParser(description="自动化压缩包处理工具")
+    parser.add_argument('-c', '--config', default='config.toml', help="配置文件路径 (默认: config.toml)")
+    parser.add_argument('-s', '--set', dest='overrides', action='append', default=[], metavar='SECTION.KEY=VALUE',
+                        help="覆盖配置项，可重复使用，例如 -s worker.unpack=2")
+
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.add_parser('process', help="完整处理流程 (默认)")
+    scan_parser = subparsers.add_parser('scan', aliases=['dry-run'], help="只扫描并列出待处理的压缩文件")
+    scan_parser.add_argument('--sizes', action='store_true',
+                             help="读取文件头中的解压后大小并预测总耗时 (RAR/7Z 需要加载 rarfile/py7zr)")
+    upload_parser = subparsers.add_parser('upload-only', help="直接上传已处理好的文件夹并提交发布")
+    upload_parser.add_argument('folders', nargs='+', type=Path, help="待上传的文件夹")
+    subparsers.add_parser('stats', help="统计源目录和输出目录")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """命令行入口"""
+    args = build_arg_parser().parse_args(argv)
+
+    if not Path(args.config).is_file():
+        print(f"配置文件不存在: {args.config}", file=sys.stderr)
+        return 1
+    try:
+        processor = ArchiveProcessor(args.config, args.overrides)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+
+    command = args.command or 'process'
+    start_time = time.perf_counter()
+    if command in ('scan', 'dry-run'):
+        processor.dry_run(args.sizes)
+    elif command == 'upload-only':
+        processor.upload_only(args.folders)
+    elif command == 'stats':
+        processor.print_stats()
+    else:
+        processor.run()
+    processor.logger.debug(f"命令 {command} 耗时: {time.perf_counter() - start_time:.2f}s")
+    return 0
 
 
 if __name__ == "__main__":
-    processor = ArchiveProcessor('config.toml')
-    processor.run()
+    sys.exit(main())